@@ -4,11 +4,15 @@ from fastapi import APIRouter, Depends, HTTPException
 from semantic_kernel.contents.chat_history import ChatHistory
 from semantic_kernel.utils.logging import setup_logging
 
-from backend import config
 from backend.decorators import log_endpoint
-from backend.dependencies import (chat_completion, execution_settings, kernel,
-                                  openai_client)
-from backend.helpers.chat_helpers import get_existing_history
+from backend.dependencies import chat_completion, execution_settings, kernel
+from backend.helpers.chat_helpers import (get_existing_history,
+                                          stream_chat_completion_content)
+from backend.helpers.embedding_cache import embedding_cache
+from backend.helpers.embedding_service import embedding_service
+from backend.helpers.rate_limiter import (azure_search_scheduler,
+                                          openai_scheduler)
+from backend.helpers.streaming import sse_event, sse_response
 from backend.schemas.llm_schemas import ChatCompletionRequest, TextToVector
 from backend.session_state import session_histories
 
@@ -51,6 +55,41 @@ async def chat_completion_endpoint(
     return {"answer": str(result)}
 
 
+@router.post("/chat_completion/stream")
+@log_endpoint
+async def chat_completion_stream_endpoint(
+    payload: ChatCompletionRequest,
+    history: ChatHistory = Depends(get_existing_history)
+):
+    """
+    Streaming variant of /chat_completion as Server-Sent Events: `token` events carry the answer
+    text as it is generated, followed by a `done` event with the full answer (or an `error` event).
+    """
+    if not payload.user_message.strip():
+        raise HTTPException(status_code=400, detail="User message must be provided")
+
+    if not history.messages and payload.system_message:
+        history.add_system_message(payload.system_message)
+
+    history.add_user_message(payload.user_message)
+
+    async def events():
+        answer = []
+        try:
+            async for text in stream_chat_completion_content(history=history, execution_settings=execution_settings, kernel=kernel):
+                answer.append(text)
+                yield sse_event({"text": text}, event="token")
+            if not answer:
+                raise ValueError("Empty response from AI model")
+            history.add_assistant_message("".join(answer))
+            yield sse_event({"answer": "".join(answer)}, event="done")
+        except Exception as e:
+            logger.error(f"Error in chat_completion stream: {e}")
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return sse_response(events())
+
+
 @router.delete("/reset_chat_history")
 @log_endpoint
 async def reset_chat_history(session_id: str):
@@ -75,12 +114,29 @@ async def vectorize_endpoint(payload: TextToVector):
         raise HTTPException(status_code=400, detail="Empty text provided")
 
     try:
-        response = openai_client.embeddings.create(
-            input=payload.text,
-            model=config.OPENAI_EMBEDDING_MODEL
-        )
-        embedding_vector = response.data[0].embedding
-        return {"vector": embedding_vector}
+        return {"vector": await embedding_service.embed(payload.text)}
     except Exception as e:
         logger.error(f"Error vectorizing text: {e}")
         raise HTTPException(status_code=500, detail="Error processing vectorization")
+
+
+@router.get("/embedding_cache_stats")
+@log_endpoint
+async def embedding_cache_stats():
+    """
+    Endpoint to report embedding cache hit/miss counters and size, and how many concurrent
+    requests shared an in-flight embedding call.
+    """
+    return {**embedding_cache.stats(), **embedding_service.stats()}
+
+
+@router.get("/rate_limit_stats")
+@log_endpoint
+async def rate_limit_stats():
+    """
+    Endpoint to report the current upstream rate limits and throttling state.
+    """
+    return {
+        "openai": openai_scheduler.stats(),
+        "azure_ai_search": azure_search_scheduler.stats(),
+    }
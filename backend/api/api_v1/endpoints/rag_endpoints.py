@@ -1,13 +1,12 @@
 import json
 import logging
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from fastapi import APIRouter, Body, Depends, HTTPException
 from pydantic import BaseModel
 from semantic_kernel.contents.chat_history import ChatHistory
 from semantic_kernel.utils.logging import setup_logging
 
-from backend import config
 from backend.api.api_v1.endpoints.search_endpoints import \
     hybrid_search_with_vectorization
 from backend.api.api_v1.endpoints.tickets_endpoints import delete_ticket
@@ -15,8 +14,13 @@ from backend.decorators import log_endpoint
 from backend.dependencies import chat_completion, execution_settings, kernel
 from backend.helpers.chat_helpers import (get_chat_completion_content,
                                           get_existing_history,
-                                          get_ticket_data)
+                                          get_ticket_data,
+                                          stream_chat_completion_content)
+from backend.helpers.streaming import (JsonStringFieldStream, sse_event,
+                                       sse_response)
+from backend.helpers.ticket_cache import ticket_cache
 from backend.helpers.utils import send_email
+from backend.interfaces.azure_ai_search import build_filter
 from backend.session_state import (get_current_context_ticket, get_history,
                                    set_current_context_ticket)
 
@@ -43,8 +47,6 @@ class Answer(BaseModel):
     function_call: Optional[str] = None
 
 
-TICKETS_DIR = config.TICKETS_DIR
-
 SETUP_ASSISTANT = (
     "You are an expert in IT ticketing. Provide clear, concise, and technically accurate responses.\n"
     "Format your answers neatly using Markdown lists, headings, or line breaks as appropriate.\n"
@@ -55,25 +57,17 @@ SETUP_ASSISTANT = (
 
 
 def load_tickets_and_update_history(history):
-    tickets = []
-    for file in TICKETS_DIR.glob("*.json"):
-        with file.open("r") as f:
-            try:
-                ticket = json.load(f)
-                tickets.append(ticket)
-            except Exception:  # Skip files that can't be parsed
-                continue
-
-    if not tickets:
+    # The context string is built once per ticket cache version and shared by all sessions.
+    tickets_context, ticket_count = ticket_cache.context()
+
+    if not ticket_count:
         history.add_user_message("There are currently no active tickets.")
     else:
-        # Combine ticket info into one context string
-        tickets_context = "\n".join([json.dumps(ticket) for ticket in tickets])
         # Store ticket data in history
         history.add_user_message(f"Here is the context of all existing tickets:\n{tickets_context}")
         logger.info(f"tickets_context = {tickets_context}")
 
-    return {"message": "Tickets loaded into memory successfully", "ticket_count": len(tickets)}
+    return {"message": "Tickets loaded into memory successfully", "ticket_count": ticket_count}
 
 
 @router.post("/generic_support_enquiry")
@@ -107,6 +101,40 @@ async def generic_support_enquiry(session_id: str, payload: Question, history: C
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generic_support_enquiry/stream")
+@log_endpoint
+async def generic_support_enquiry_stream(session_id: str, payload: Question, history: ChatHistory = Depends(get_existing_history)):
+    """
+    Streaming variant of /generic_support_enquiry as Server-Sent Events: `token` events carry the
+    answer text as it is generated, followed by a `done` event with the full answer (or an `error` event).
+    """
+    history = get_history(session_id)
+
+    if not payload.question.strip():
+        raise HTTPException(status_code=400, detail="Empty query was provided")
+
+    # Load all tickets to provide context to the AI
+    await load_tickets(session_id=session_id)
+
+    # Add user question to history
+    history.add_user_message(payload.question)
+
+    async def events():
+        answer = []
+        try:
+            async for text in stream_chat_completion_content(history=history, execution_settings=execution_settings, kernel=kernel):
+                answer.append(text)
+                yield sse_event({"text": text}, event="token")
+            # Add AI response to history
+            history.add_assistant_message("".join(answer))
+            yield sse_event({"answer": "".join(answer)}, event="done")
+        except Exception as e:
+            logger.error("Error in generic_support_enquiry stream: %s", str(e))
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return sse_response(events())
+
+
 @router.post("/custom_query")
 @log_endpoint
 async def custom_query(session_id: str, payload: Question, system_message: str, history: ChatHistory = Depends(get_existing_history)):
@@ -139,10 +167,11 @@ async def custom_query(session_id: str, payload: Question, system_message: str,
 # XXX nevidi tickety pre jednotlivich zakaznikov
 # XXX nech ide na step 2 vo workflow len ked je k tomu vyzvaty (nech procesuje ticket len ked ho poprosis nech ho procesuje)
 
-@router.post("/support_workflow")
-@log_endpoint
-async def support_workflow(session_id: str, support_workflow_step: int, question: str = Body(...), history: ChatHistory = Depends(get_existing_history)):
-    history = get_history(session_id)
+async def start_support_workflow(session_id: str, support_workflow_step: int, question: str, history: ChatHistory) -> Tuple[int, Optional[List[dict]]]:
+    """
+    Prepare the chat history for a support workflow step. Returns the next workflow step and the
+    similar historical tickets found for step 3.
+    """
     next_workflow_action_step = 1
     similar_tickets = None
 
@@ -177,7 +206,11 @@ async def support_workflow(session_id: str, support_workflow_step: int, question
 
         if ticket_text:
             logger.info("Ticket text retrieved: %s", ticket_text)
-            similar_tickets = await hybrid_search_with_vectorization(text_query=ticket_text, top_k=5, include_vector=False)
+            # Only search the customer's own history when the ticket names its company.
+            company_name = ticket_json.get("company_name")
+            similar_tickets = await hybrid_search_with_vectorization(text_query=ticket_text, top_k=5, collapse_chunks=True,
+                                                                     include_vector=False, fields=None, facets=None,
+                                                                     filter=build_filter(company_name=[company_name] if company_name else None))
             similar_tickets = similar_tickets["value"]
 
         # XXX TODO decomission history.clear from here, utilise history clear on when context ticket changes.
@@ -205,89 +238,135 @@ async def support_workflow(session_id: str, support_workflow_step: int, question
     else:
         raise HTTPException(status_code=400, detail=f"Unsupported workflow step: {support_workflow_step}.")
 
+    history.add_system_message(system_message)
+    history.add_user_message(question)
+
+    # Setup response format
+    execution_settings.structured_json_response = True
+    execution_settings.response_format = Answer
+
+    return next_workflow_action_step, similar_tickets
+
+
+async def finish_support_workflow(session_id: str, history: ChatHistory, result_str: str,
+                                  next_workflow_action_step: int, similar_tickets: Optional[List[dict]]) -> dict:
+    """
+    Handle the model's structured answer for a support workflow step: track the context ticket,
+    decide the next step and run any requested function call.
+    """
+    # Try to parse the result as JSON
     try:
-        history.add_system_message(system_message)
-        history.add_user_message(question)
+        parsed_result = json.loads(result_str)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=500, detail="Kernel response did not follow the strict JSON format.")
+
+    # Optionally add the result to history
+    history.add_message({"role": "assistant", "content": result_str})
+
+    # Decide on the next action step
+    recent_context_ticket = get_current_context_ticket(session_id=session_id)
+    current_context_ticket = parsed_result["context_ticket_id"]
+    if current_context_ticket:
+        if current_context_ticket != recent_context_ticket:
+            next_workflow_action_step = 2
+            logger.info("Context ticket has changed from %s to %s for session_id: %s", recent_context_ticket, current_context_ticket, session_id)
+    else:
+        parsed_result["context_ticket_id"] = recent_context_ticket
+
+    # Inject next workflow step into the response
+    parsed_result["next_workflow_action_step"] = next_workflow_action_step
+    set_current_context_ticket(session_id=session_id, ticket_id=parsed_result["context_ticket_id"])
+
+    if similar_tickets:
+        parsed_result["semantic_ticket_matches"] = similar_tickets
+
+    function_call = parsed_result.get("function_call") or None
+    if function_call:
+        if function_call == "email_escalation":
+            escalation_payload = Question(
+                question="Write short escalation email about this ticket to L2. Sign it as Jakub. Leave out subject, provide just the email body."
+            )
+            history.add_user_message(escalation_payload.question)
+            result = await get_chat_completion_content(
+                history=history,
+                execution_settings=execution_settings,
+                kernel=kernel
+            )
+            result = json.loads(str(result))
+
+            ticket_text, ticket_json = await get_ticket_data(ticket_id=current_context_ticket)
+            email_subject = f"Escalation: Ticket {current_context_ticket} - {ticket_json["title"]}"
+            send_email(to_addr="jakub.kudlacek@cod8.io", subject=email_subject, body=result["answer"])
+
+            logger.info(f"Deleting ticket {current_context_ticket}")
+            await delete_ticket(ticket_id=current_context_ticket)
+            # Refresh tickets AI memory
+            await load_tickets(session_id)
+            logger.info("** Successfully loaded tickets for session_id: %s", session_id)
+
+            answer_obj = Answer(
+                answer=f"I have escalated {current_context_ticket} to T2.",
+                context_ticket_id="",
+                function_call="email_escalation"
+            )
+            parsed_result = answer_obj.dict()
+            parsed_result["next_workflow_action_step"] = 1
+            current_context_ticket = None
+            set_current_context_ticket(session_id=session_id, ticket_id="")
+
+    # XXX TODO zresetovat historiu (a znovu nasetapovat veci) ked context_ticket changes
+    # XXX TODO record important info on the system message (e.g. name of who is using the system, other info..)
+
+    # Return the parsed JSON object directly (ensuring it has exactly the expected keys)
+    return parsed_result
 
-        # Setup response format
-        execution_settings.structured_json_response = True
-        execution_settings.response_format = Answer
 
+@router.post("/support_workflow")
+@log_endpoint
+async def support_workflow(session_id: str, support_workflow_step: int, question: str = Body(...), history: ChatHistory = Depends(get_existing_history)):
+    history = get_history(session_id)
+    next_workflow_action_step, similar_tickets = await start_support_workflow(session_id, support_workflow_step, question, history)
+
+    try:
         # Get the AI response, instructing the kernel to follow a strict response format
         result = await get_chat_completion_content(history=history, execution_settings=execution_settings, kernel=kernel)
-
-        # Convert the result to a string and try to parse it as JSON
-        result_str = str(result)
-        try:
-            parsed_result = json.loads(result_str)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=500, detail="Kernel response did not follow the strict JSON format.")
-
-        # Optionally add the result to history
-        history.add_message({"role": "assistant", "content": result_str})
-
-        # Decide on the next action step
-        recent_context_ticket = get_current_context_ticket(session_id=session_id)
-        current_context_ticket = parsed_result["context_ticket_id"]
-        if current_context_ticket:
-            if current_context_ticket != recent_context_ticket:
-                next_workflow_action_step = 2
-                logger.info("Context ticket has changed from %s to %s for session_id: %s", recent_context_ticket, current_context_ticket, session_id)
-        else:
-            parsed_result["context_ticket_id"] = recent_context_ticket
-
-        # Inject next workflow step into the response
-        parsed_result["next_workflow_action_step"] = next_workflow_action_step
-        set_current_context_ticket(session_id=session_id, ticket_id=parsed_result["context_ticket_id"])
-
-        if similar_tickets:
-            parsed_result["semantic_ticket_matches"] = similar_tickets
-
-        function_call = parsed_result.get("function_call") or None
-        if function_call:
-            if function_call == "email_escalation":
-                escalation_payload = Question(
-                    question="Write short escalation email about this ticket to L2. Sign it as Jakub. Leave out subject, provide just the email body."
-                )
-                history.add_user_message(escalation_payload.question)
-                result = await get_chat_completion_content(
-                    history=history,
-                    execution_settings=execution_settings,
-                    kernel=kernel
-                )
-                result = json.loads(str(result))
-
-                ticket_text, ticket_json = await get_ticket_data(ticket_id=current_context_ticket)
-                email_subject = f"Escalation: Ticket {current_context_ticket} - {ticket_json["title"]}"
-                send_email(to_addr="jakub.kudlacek@cod8.io", subject=email_subject, body=result["answer"])
-
-                logger.info(f"Deleting ticket {current_context_ticket}")
-                await delete_ticket(ticket_id=current_context_ticket)
-                # Refresh tickets AI memory
-                await load_tickets(session_id)
-                logger.info("** Successfully loaded tickets for session_id: %s", session_id)
-
-                answer_obj = Answer(
-                    answer=f"I have escalated {current_context_ticket} to T2.",
-                    context_ticket_id="",
-                    function_call="email_escalation"
-                )
-                parsed_result = answer_obj.dict()
-                parsed_result["next_workflow_action_step"] = 1
-                current_context_ticket = None
-                set_current_context_ticket(session_id=session_id, ticket_id="")
-
-        # XXX TODO zresetovat historiu (a znovu nasetapovat veci) ked context_ticket changes
-        # XXX TODO record important info on the system message (e.g. name of who is using the system, other info..)
-
-        # Return the parsed JSON object directly (ensuring it has exactly the expected keys)
-        return parsed_result
+        return await finish_support_workflow(session_id, history, str(result), next_workflow_action_step, similar_tickets)
 
     except Exception as e:
         logger.error("Error in support_workflow: %s", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/support_workflow/stream")
+@log_endpoint
+async def support_workflow_stream(session_id: str, support_workflow_step: int, question: str = Body(...), history: ChatHistory = Depends(get_existing_history)):
+    """
+    Streaming variant of /support_workflow as Server-Sent Events: `token` events carry the answer
+    text as the model generates it, then a `result` event carries the full response (context_ticket_id,
+    function_call, next_workflow_action_step, ...) exactly as /support_workflow returns it, or an
+    `error` event.
+    """
+    history = get_history(session_id)
+    next_workflow_action_step, similar_tickets = await start_support_workflow(session_id, support_workflow_step, question, history)
+
+    async def events():
+        chunks = []
+        answer = JsonStringFieldStream("answer")
+        try:
+            async for text in stream_chat_completion_content(history=history, execution_settings=execution_settings, kernel=kernel):
+                chunks.append(text)
+                answer_text = answer.feed(text)
+                if answer_text:
+                    yield sse_event({"text": answer_text}, event="token")
+            result = await finish_support_workflow(session_id, history, "".join(chunks), next_workflow_action_step, similar_tickets)
+            yield sse_event(result, event="result")
+        except Exception as e:
+            logger.error("Error in support_workflow stream: %s", str(e))
+            yield sse_event({"detail": getattr(e, "detail", str(e))}, event="error")
+
+    return sse_response(events())
+
+
 @router.post("/load_tickets_to_memory")
 @log_endpoint
 async def load_tickets(session_id: str, history: ChatHistory = Depends(get_existing_history)):
@@ -1,25 +1,24 @@
+import json
 import logging
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from semantic_kernel.utils.logging import setup_logging
 
 from backend import config
 from backend.decorators import log_endpoint
-from backend.interfaces.azure_ai_search import AzureSearchClient
+from backend.helpers.search_cache import search_cache
+from backend.interfaces.azure_ai_search import (build_filter,
+                                                get_search_client,
+                                                search_flights)
+from backend.schemas.search_schemas import BatchSearchRequest
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-search_client = AzureSearchClient(
-    service_url=config.AZURE_AI_SEARCH_SERVICE,
-    index_name="ticket_index",
-    api_key=config.AZURE_AI_SEARCH_API_KEY,
-    api_version=config.AZURE_AI_SEARCH_API_VERSION,
-    vector_field="vector"
-)
-
 # Set up logging for the kernel
 setup_logging()
 
@@ -28,6 +27,48 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Fields returned by the search endpoints unless the caller asks for fewer. The vector is only
+# downloaded when include_vector is set.
+RESULT_FIELDS = [
+    "id",
+    "ticket_id",
+    "title",
+    "company_name",
+    "date_entered",
+    "type",
+    "priority",
+    "source",
+    "team",
+    "parent_id",
+    "doc_type",
+    "chunk_index",
+    "discussion"
+]
+
+FIELDS_DESCRIPTION = "Fields to return (all except the vector by default); e.g. leave out 'discussion' for smaller responses"
+
+
+def select_fields(fields: Optional[List[str]], include_vector: bool) -> List[str]:
+    """Projection requested from Azure AI Search for the given endpoint parameters."""
+    selected = [field for field in (fields or RESULT_FIELDS) if field != "vector"]
+    if include_vector:
+        selected.append("vector")
+    return selected
+
+
+def search_filter(
+    company_name: Optional[List[str]] = Query(None, description="Only tickets of these companies"),
+    team: Optional[List[str]] = Query(None, description="Only tickets of these teams"),
+    priority: Optional[List[str]] = Query(None, description="Only tickets with these priorities"),
+    date_from: Optional[datetime] = Query(None, description="Only tickets entered at or after this time (UTC unless given)"),
+    date_to: Optional[datetime] = Query(None, description="Only tickets entered at or before this time (UTC unless given)")
+) -> Optional[str]:
+    """OData filter pushed down to Azure AI Search for the common ticket filters."""
+    return build_filter(company_name=company_name, team=team, priority=priority, date_from=date_from, date_to=date_to)
+
+
+FACETS_DESCRIPTION = "Fields to return value counts for, e.g. company_name, team or priority (Azure facet syntax such as 'team,count:20' is accepted)"
+
 
 @router.get("/hybrid_search")
 @log_endpoint
@@ -35,19 +76,22 @@ async def hybrid_search(
     text_query: Optional[str] = Query(None, description="Text query for hybrid search"),
     embedding: Optional[List[float]] = Query(None, description="Embedding vector for hybrid search"),
     top_k: int = Query(10, description="Number of top results to return"),
-    include_vector: bool = Query(True, description="Whether to include vector in the response")
+    collapse_chunks: bool = Query(True, description="Whether to collapse discussion chunk hits onto their parent ticket"),
+    include_vector: bool = Query(False, description="Whether to include vector in the response"),
+    fields: Optional[List[str]] = Query(None, description=FIELDS_DESCRIPTION),
+    facets: Optional[List[str]] = Query(None, description=FACETS_DESCRIPTION),
+    filter: Optional[str] = Depends(search_filter)
 ):
     """Perform hybrid search with optional text query and embedding."""
-    results = await search_client.hybrid_search(
+    results = await get_search_client().hybrid_search(
         text_query=text_query,
         embedding=embedding if embedding else None,
-        top_k=top_k
+        top_k=top_k,
+        collapse_chunks=collapse_chunks,
+        select=select_fields(fields, include_vector),
+        filter=filter,
+        facets=facets
     )
-
-    if not include_vector:
-        for result in results:
-            result.pop("vector", None)
-
     return results
 
 
@@ -56,25 +100,55 @@ async def hybrid_search(
 async def hybrid_search_with_vectorization(
     text_query: str = Query(..., description="Text query for vectorization and hybrid search"),
     top_k: int = Query(10, description="Number of top results to return"),
-    include_vector: bool = Query(True, description="Whether to include vector in the response")
+    collapse_chunks: bool = Query(True, description="Whether to collapse discussion chunk hits onto their parent ticket"),
+    include_vector: bool = Query(False, description="Whether to include vector in the response"),
+    fields: Optional[List[str]] = Query(None, description=FIELDS_DESCRIPTION),
+    facets: Optional[List[str]] = Query(None, description=FACETS_DESCRIPTION),
+    filter: Optional[str] = Depends(search_filter)
 ):
     """Perform a hybrid search query with vectorization."""
-    results = await search_client.query_with_vectorization(
+    results = await get_search_client().query_with_vectorization(
         text_query=text_query,
-        top_k=top_k
+        top_k=top_k,
+        collapse_chunks=collapse_chunks,
+        select=select_fields(fields, include_vector),
+        filter=filter,
+        facets=facets
     )
+    return results
 
-    if not include_vector:
-        if isinstance(results, dict) and "value" in results and isinstance(results["value"], list):
-            for result in results["value"]:
-                if isinstance(result, dict):
-                    result.pop("vector", None)
-        elif isinstance(results, list):
-            for result in results:
-                if isinstance(result, dict):
-                    result.pop("vector", None)
 
-    return results
+@router.post("/batch_hybrid_search_with_vectorization")
+@log_endpoint
+async def batch_hybrid_search_with_vectorization(payload: BatchSearchRequest):
+    """
+    Run hybrid_search_with_vectorization for several queries in one call. All queries are
+    embedded in a single request and searched concurrently. Results come back in query order,
+    each with either its search results or an error.
+    """
+    if not payload.queries:
+        raise HTTPException(status_code=400, detail="No queries were provided")
+    if len(payload.queries) > config.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {config.SEARCH_BATCH_MAX_QUERIES} queries per batch")
+
+    valid = [index for index, query in enumerate(payload.queries) if query.strip()]
+    results = await get_search_client().query_many_with_vectorization(
+        text_queries=[payload.queries[index] for index in valid],
+        top_k=payload.top_k,
+        collapse_chunks=payload.collapse_chunks,
+        select=select_fields(payload.fields, payload.include_vector),
+        filter=build_filter(company_name=payload.company_name, team=payload.team, priority=payload.priority,
+                            date_from=payload.date_from, date_to=payload.date_to),
+        facets=payload.facets
+    )
+
+    response = [{"query": query, "results": None, "error": "Empty query was provided"} for query in payload.queries]
+    for index, result in zip(valid, results):
+        if isinstance(result, Exception):
+            response[index]["error"] = str(result) or type(result).__name__
+        else:
+            response[index].update({"results": result, "error": None})
+    return response
 
 
 @router.get("/fulltext_search")
@@ -82,19 +156,21 @@ async def hybrid_search_with_vectorization(
 async def fulltext_search(
     text_query: str = Query(..., description="Text query for full-text search"),
     top_k: int = Query(10, description="Number of top results to return"),
-    include_vector: bool = Query(True, description="Whether to include vector in the response")
+    collapse_chunks: bool = Query(True, description="Whether to collapse discussion chunk hits onto their parent ticket"),
+    include_vector: bool = Query(False, description="Whether to include vector in the response"),
+    fields: Optional[List[str]] = Query(None, description=FIELDS_DESCRIPTION),
+    facets: Optional[List[str]] = Query(None, description=FACETS_DESCRIPTION),
+    filter: Optional[str] = Depends(search_filter)
 ):
     """Perform full-text search with the given query."""
-    results = await search_client.fulltext_search(
+    results = await get_search_client().fulltext_search(
         text_query=text_query,
-        top_k=top_k
+        top_k=top_k,
+        collapse_chunks=collapse_chunks,
+        select=select_fields(fields, include_vector),
+        filter=filter,
+        facets=facets
     )
-
-    if not include_vector and isinstance(results, list):
-        for result in results:
-            if isinstance(result, dict):
-                result.pop("vector", None)
-
     return results
 
 
@@ -103,19 +179,21 @@ async def fulltext_search(
 async def vector_search(
     embedding: List[float] = Query(..., description="Embedding vector for vector search"),
     top_k: int = Query(10, description="Number of top results to return"),
-    include_vector: bool = Query(True, description="Whether to include vector in the response")
+    collapse_chunks: bool = Query(True, description="Whether to collapse discussion chunk hits onto their parent ticket"),
+    include_vector: bool = Query(False, description="Whether to include vector in the response"),
+    fields: Optional[List[str]] = Query(None, description=FIELDS_DESCRIPTION),
+    facets: Optional[List[str]] = Query(None, description=FACETS_DESCRIPTION),
+    filter: Optional[str] = Depends(search_filter)
 ):
     """Perform vector-based search with the given embedding."""
-    results = await search_client.vector_search(
+    results = await get_search_client().vector_search(
         embedding=embedding,
-        top_k=top_k
+        top_k=top_k,
+        collapse_chunks=collapse_chunks,
+        select=select_fields(fields, include_vector),
+        filter=filter,
+        facets=facets
     )
-
-    if not include_vector and isinstance(results, list):
-        for result in results:
-            if isinstance(result, dict):
-                result.pop("vector", None)
-
     return results
 
 
@@ -123,14 +201,11 @@ async def vector_search(
 @log_endpoint
 async def get_document(
     doc_id: str = Query(..., description="ID of the document to retrieve"),
-    include_vector: bool = Query(True, description="Whether to include vector in the response")
+    include_vector: bool = Query(False, description="Whether to include vector in the response"),
+    fields: Optional[List[str]] = Query(None, description=FIELDS_DESCRIPTION)
 ):
     """Retrieve a document by its ID."""
-    result = await search_client.get_document(doc_id)
-
-    if not include_vector and isinstance(result, dict):
-        result.pop("vector", None)
-
+    result = await get_search_client().get_document(doc_id, select=select_fields(fields, include_vector))
     return result
 
 
@@ -138,16 +213,44 @@ async def get_document(
 @log_endpoint
 async def list_documents(
     batch_size: int = Query(1000, description="Number of documents to retrieve per batch"),
-    limit: int = Query(10, description="Total number of documents to retrieve"),
+    limit: int = Query(10, ge=0, description="Total number of documents to retrieve; 0 for all of them"),
     offset: int = Query(0, description="Number of documents to skip"),
-    include_vector: bool = Query(True, description="Whether to include vector in the response")
+    include_vector: bool = Query(False, description="Whether to include vector in the response"),
+    fields: Optional[List[str]] = Query(None, description=FIELDS_DESCRIPTION),
+    stream: bool = Query(False, description="Stream documents as NDJSON, e.g. to export the whole index with limit=0"),
+    prefetch: int = Query(2, ge=1, le=8, description="Pages fetched ahead of the client when streaming")
 ):
-    """List documents in the index with optional limit and offset."""
-    results = await search_client.list_documents(batch_size=batch_size, limit=limit, offset=offset)
+    """
+    List documents in the index, in key order, with optional limit and offset. A limit of 0 lists
+    every document after the offset, in both modes.
+
+    With stream=true documents are written out one JSON object per line as pages arrive, so
+    server memory stays bounded by the prefetched pages regardless of the export size. Prefer it
+    for large or unlimited listings, without it the whole response is built in memory.
+    """
+    client = get_search_client()
+    select = select_fields(fields, include_vector)
+    if stream:
+        documents = client.iter_documents(batch_size=batch_size, limit=limit or None, offset=offset,
+                                          select=select, prefetch=prefetch)
 
-    if not include_vector and isinstance(results, list):
-        for result in results:
-            if isinstance(result, dict):
-                result.pop("vector", None)
+        async def ndjson():
+            async for doc in documents:
+                yield json.dumps(doc) + "\n"
 
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    results = await client.list_documents(
+        batch_size=batch_size,
+        limit=limit or None,
+        offset=offset,
+        select=select
+    )
     return results
+
+
+@router.get("/search_cache_stats")
+@log_endpoint
+async def search_cache_stats():
+    """Hit rate and size of the search result cache, and how many searches shared an in-flight request."""
+    return {**search_cache.stats(), "single_flight": search_flights.stats()}
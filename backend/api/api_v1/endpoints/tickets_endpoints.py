@@ -1,5 +1,5 @@
-import json
 import logging
+from urllib.parse import quote
 
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
@@ -8,6 +8,8 @@ from semantic_kernel.utils.logging import setup_logging
 
 from backend import config
 from backend.decorators import log_endpoint
+from backend.helpers.ticket_cache import ticket_cache
+from backend.helpers.ticket_store import ticket_store
 from backend.session_state import refresh_all_session_tickets
 
 logger = logging.getLogger(__name__)
@@ -19,8 +21,6 @@ class Question(BaseModel):
     question: str
 
 
-TICKETS_DIR = config.TICKETS_DIR
-
 # Set up logging for the kernel
 setup_logging()
 
@@ -30,6 +30,11 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+def ticket_path(ticket_id: str) -> str:
+    """Relative URL the UI fetches a ticket's details from."""
+    return f"{config.API_V1_STR.lstrip('/')}/tickets/{quote(str(ticket_id), safe='')}"
+
+
 @router.post("/tickets/")
 @log_endpoint
 async def create_ticket(request: Request):
@@ -39,9 +44,8 @@ async def create_ticket(request: Request):
     if not ticket_id:
         return JSONResponse(status_code=400, content={"message": "ticket_id is required"})
 
-    ticket_path = TICKETS_DIR / f"{ticket_id}.json"
-    with ticket_path.open("w") as f:
-        json.dump(data, f, indent=2)
+    ticket_store.create(data)
+    ticket_cache.invalidate()
 
     await refresh_all_session_tickets()
 
@@ -53,28 +57,38 @@ async def create_ticket(request: Request):
 @router.get("/tickets")
 @log_endpoint
 async def list_tickets():
-    tickets = []
-    files = sorted(
-        TICKETS_DIR.glob("*.json"),
-        key=lambda file: file.stat().st_mtime,
-        reverse=True
-    )
-    for file in files:
-        with file.open("r") as f:
-            ticket = json.load(f)
-            ticket['path'] = "ticket_files/" + file.name
-            tickets.append(ticket)
+    tickets = ticket_cache.list()
+    for ticket in tickets:
+        ticket['path'] = ticket_path(ticket["ticket_id"])
     return JSONResponse(content=tickets)
 
 
-@router.delete("/tickets/{ticket_id}")
+@router.patch("/tickets/{ticket_id:path}")
+@log_endpoint
+async def update_ticket(ticket_id: str, request: Request):
+    """
+    Update some fields of a ticket (e.g. status or priority), keeping the others.
+    """
+    fields = await request.json()
+    if not isinstance(fields, dict):
+        return JSONResponse(status_code=400, content={"message": "A JSON object with the fields to update is required"})
+
+    ticket = ticket_store.update(ticket_id, fields)
+    if ticket is None:
+        return JSONResponse(status_code=404, content={"message": "Ticket not found"})
+    ticket_cache.invalidate()
+
+    await refresh_all_session_tickets()
+
+    return JSONResponse(content=ticket)
+
+
+@router.delete("/tickets/{ticket_id:path}")
 @log_endpoint
 async def delete_ticket(ticket_id: str):
-    file_path = TICKETS_DIR / f"{ticket_id}.json"
-    if not file_path.exists():
+    if not ticket_store.delete(ticket_id):
         return {"message": "Ticket not found"}
-
-    file_path.unlink()
+    ticket_cache.invalidate()
 
     await refresh_all_session_tickets()
 
@@ -83,22 +97,19 @@ async def delete_ticket(ticket_id: str):
     }
 
 
-@router.get("/tickets")
-@log_endpoint
-async def api_list_tickets():
-    tickets = []
-    for file in TICKETS_DIR.glob("*.json"):
-        with file.open("r") as f:
-            tickets.append(json.load(f))
-    return JSONResponse(content=tickets)
-
-
-@router.get("/tickets/{ticket_id}")
+@router.get("/tickets/{ticket_id:path}")
 @log_endpoint
 async def get_ticket(ticket_id: str):
-    ticket_path = TICKETS_DIR / f"{ticket_id}.json"
-    if not ticket_path.exists():
+    ticket = ticket_cache.get(ticket_id)
+    if ticket is None:
         return JSONResponse(status_code=404, content={"message": "Ticket not found"})
-    with ticket_path.open("r") as f:
-        ticket = json.load(f)
     return JSONResponse(content=ticket)
+
+
+@router.get("/ticket_cache_stats")
+@log_endpoint
+async def ticket_cache_stats():
+    """
+    Current ticket cache version, how often tickets were loaded from the store, and how many are cached.
+    """
+    return ticket_cache.stats()
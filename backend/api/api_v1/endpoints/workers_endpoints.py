@@ -1,8 +1,9 @@
 import logging
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 
 from backend.decorators import log_endpoint
+from backend.helpers.import_jobs import import_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -11,11 +12,50 @@ router = APIRouter()
 
 # XXX TODO add customer (create DB schema per customer etc etc..)
 
-@router.get("/import_historical_tickets")
+@router.post("/import_historical_tickets", status_code=202)
 @log_endpoint
 async def import_historical_tickets(csv_folder_path: str):
     """
     Generate a vectorized knowledgebase from historical support tickets.
+
+    The import runs in the background; poll /import_historical_tickets/{job_id} for progress.
+    """
+    try:
+        job = import_jobs.submit(csv_folder_path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+
+@router.get("/import_historical_tickets")
+@log_endpoint
+async def list_import_jobs():
+    """
+    List recent import jobs, newest first.
+    """
+    return [job.to_dict() for job in import_jobs.list_jobs()]
+
+
+@router.get("/import_historical_tickets/{job_id}")
+@log_endpoint
+async def get_import_job(job_id: str):
+    """
+    Return the state and progress (tickets parsed, embedded, uploaded, failed, ETA) of an import job.
+    """
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.to_dict()
+
+
+@router.delete("/import_historical_tickets/{job_id}")
+@log_endpoint
+async def cancel_import_job(job_id: str):
+    """
+    Cancel a queued or running import job. Tickets uploaded so far stay indexed and are
+    skipped by the next import.
     """
-    # XXX TODO
-    ...
+    job = import_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job.to_dict()
@@ -33,10 +33,87 @@ OPENAI_ENDPOINT = os.getenv("OPENAI_ENDPOINT", "MISSING-OPENAI_ENDPOINT")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "MISSING-OPENAI_API_KEY")
 OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "MISSING-OPENAI_EMBEDDING_MODEL")
 
+# Upstream for embeddings in the API and the ingestion worker: "openai" calls OPENAI_BASE_URL with CHATGPT_KEY,
+# "azure" calls the OPENAI_ENDPOINT resource with OPENAI_API_KEY, or with Azure AD tokens when AZURE_OPENAI_USE_AAD is set.
+OPENAI_PROVIDER = os.getenv("OPENAI_PROVIDER", "openai")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+AZURE_OPENAI_USE_AAD = os.getenv("AZURE_OPENAI_USE_AAD", "false").lower() in ("1", "true", "yes")
+# Deployment serving OPENAI_EMBEDDING_MODEL on Azure; the "openai" provider uses the model name itself.
+OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("OPENAI_EMBEDDING_DEPLOYMENT", OPENAI_EMBEDDING_MODEL)
+
+# Starting rate limits for upstream calls, corrected at runtime from x-ratelimit-* response headers.
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "3000"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "1000000"))
+AZURE_AI_SEARCH_REQUESTS_PER_MINUTE = int(os.getenv("AZURE_AI_SEARCH_REQUESTS_PER_MINUTE", "6000"))
+
+# Shared keep-alive connection pool for upstream HTTP calls (Azure AI Search, OpenAI embeddings). HTTP/2 also needs the h2 package.
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+# Batching limits for bulk embedding requests (the embeddings API accepts at most 2048 inputs per request).
+EMBEDDING_BATCH_MAX_INPUTS = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", "2048"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+# API embedding requests arriving within this window are sent upstream together, up to this many texts.
+EMBEDDING_MICROBATCH_WINDOW_MS = float(os.getenv("EMBEDDING_MICROBATCH_WINDOW_MS", "5"))
+EMBEDDING_MICROBATCH_MAX_SIZE = int(os.getenv("EMBEDDING_MICROBATCH_MAX_SIZE", "64"))
+
+# Embedding cache shared by the API and the ingestion worker.
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+
+# Search result cache. Anything that changes the index touches SEARCH_INDEX_GENERATION_PATH, which
+# invalidates the cache in every process sharing the data directory.
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SEARCH_INDEX_GENERATION_PATH = Path(os.getenv("SEARCH_INDEX_GENERATION_PATH", "data/index_generation"))
+
+# Batch search endpoint: most queries per request and how many of their searches run at once.
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "50"))
+SEARCH_BATCH_CONCURRENCY = int(os.getenv("SEARCH_BATCH_CONCURRENCY", "8"))
+
+# Long ticket discussions are indexed as overlapping chunks of this many tokens.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+
+# Ingestion pipeline: tickets per batch, concurrent workers per stage and queue depth between stages.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+INGEST_UPLOAD_CONCURRENCY = int(os.getenv("INGEST_UPLOAD_CONCURRENCY", "4"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+# Rows per chunk when streaming CSV exports; 0 loads each file at once.
+INGEST_CSV_CHUNK_SIZE = int(os.getenv("INGEST_CSV_CHUNK_SIZE", "50000"))
+# Parsed tickets are spilled to disk, partitioned by ticket id, and aggregated one partition at a time;
+# exports are split into enough partitions for each to hold about this much CSV data.
+INGEST_SPILL_PARTITION_BYTES = int(os.getenv("INGEST_SPILL_PARTITION_BYTES", str(64 * 1024 * 1024)))
+# Timezone of the timestamps in the ticket CSV exports; they are indexed in UTC.
+INGEST_DATE_TIMEZONE = os.getenv("INGEST_DATE_TIMEZONE", "UTC")
+INGEST_MANIFEST_PATH = Path(os.getenv("INGEST_MANIFEST_PATH", "data/ingest_manifest.sqlite3"))
+
+# Background imports started from the API: CSV folders must live under IMPORT_CSV_ROOT, and jobs run with
+# less parallelism than the standalone worker so they leave CPU and upstream quota for the chat endpoints.
+IMPORT_CSV_ROOT = Path(os.getenv("IMPORT_CSV_ROOT", "data"))
+IMPORT_MAX_CONCURRENT_JOBS = int(os.getenv("IMPORT_MAX_CONCURRENT_JOBS", "1"))
+IMPORT_PARSE_WORKERS = int(os.getenv("IMPORT_PARSE_WORKERS", "1"))
+IMPORT_EMBED_CONCURRENCY = int(os.getenv("IMPORT_EMBED_CONCURRENCY", "1"))
+IMPORT_UPLOAD_CONCURRENCY = int(os.getenv("IMPORT_UPLOAD_CONCURRENCY", "2"))
+IMPORT_JOB_HISTORY = int(os.getenv("IMPORT_JOB_HISTORY", "50"))
+# Share of each upstream rate limit that imports may use, the rest stays available to interactive calls.
+IMPORT_RATE_LIMIT_SHARE = float(os.getenv("IMPORT_RATE_LIMIT_SHARE", "0.5"))
+
 CHATGPT_KEY = os.getenv("CHATGPT_KEY", "MISSING-CHATGPT_KEY")
 
 TICKETS_DIR = Path("data/tickets")
 TICKETS_DIR.mkdir(exist_ok=True)
+# Live tickets are kept in this SQLite file; JSON files found in TICKETS_DIR are imported at startup.
+TICKET_STORE_PATH = Path(os.getenv("TICKET_STORE_PATH", "data/tickets.sqlite3"))
+# How often the API checks TICKETS_DIR and the store for tickets written by someone else; 0 disables the watcher.
+TICKET_WATCH_INTERVAL_SECONDS = float(os.getenv("TICKET_WATCH_INTERVAL_SECONDS", "2"))
 
 SMTP_SERVER = os.getenv("SMTP_SERVER", "MISSING-SMTP_SERVER")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "MISSING-SMTP_PORT"))
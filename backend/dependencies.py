@@ -1,7 +1,6 @@
 import logging
 
 import semantic_kernel as sk
-from openai import OpenAI
 from semantic_kernel.connectors.ai.function_choice_behavior import \
     FunctionChoiceBehavior
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
@@ -15,7 +14,6 @@ logger = logging.getLogger(__name__)
 kernel = sk.Kernel()
 execution_settings = AzureChatPromptExecutionSettings()
 execution_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
-openai_client = OpenAI(api_key=config.CHATGPT_KEY)
 
 chat_completion = AzureChatCompletion(
     deployment_name=config.AZURE_OPENAI_DEPLOYMENT_NAME,
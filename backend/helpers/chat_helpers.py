@@ -1,10 +1,10 @@
-import json
+from typing import AsyncIterator
 
 from fastapi import HTTPException
 from semantic_kernel.contents.chat_history import ChatHistory
 
-from backend.api.api_v1.endpoints.tickets_endpoints import get_ticket
 from backend.dependencies import chat_completion
+from backend.helpers.ticket_cache import ticket_cache
 from backend.session_state import get_history
 
 
@@ -16,8 +16,9 @@ def get_existing_history(session_id: str) -> ChatHistory:
 
 
 async def get_ticket_data(ticket_id: str):
-    response = await get_ticket(ticket_id=ticket_id)
-    ticket_json = json.loads(response.body.decode("utf-8"))
+    ticket_json = ticket_cache.get(ticket_id) if ticket_id else None
+    if ticket_json is None:
+        ticket_json = {"message": "Ticket not found"}
     ticket_text = ticket_json.get("title", "") + " " + ticket_json.get("description", "")
     return ticket_text, ticket_json
 
@@ -28,3 +29,16 @@ async def get_chat_completion_content(history, execution_settings, kernel):
                 settings=execution_settings,
                 kernel=kernel
             )
+
+
+async def stream_chat_completion_content(history, execution_settings, kernel) -> AsyncIterator[str]:
+    """Yield the assistant's reply text in pieces as the model generates it."""
+    async for message in chat_completion.get_streaming_chat_message_content(
+                chat_history=history,
+                settings=execution_settings,
+                kernel=kernel
+            ):
+        # Function call chunks carry no text.
+        text = str(message) if message is not None else ""
+        if text:
+            yield text
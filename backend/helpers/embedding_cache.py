@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different inputs share a cache entry."""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, normalized text hash).
+
+    The first tier is an in-memory LRU of recently used vectors, held as compact float32
+    arrays. The second tier is a SQLite
+    file storing vectors as float32 blobs, evicted least-recently-used first once it grows
+    beyond `max_bytes`. Safe to use from multiple threads.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, memory_entries: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory: "OrderedDict[str, array]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self.connection.commit()
+        self.disk_bytes = self.connection.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: array):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[int, List[float]]:
+        """Return cached vectors for the given texts, keyed by their position in `texts`."""
+        keys = [self.key(model, text) for text in texts]
+        found = {}
+        with self.lock:
+            disk_lookups = {}
+            for index, key in enumerate(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[index] = self.memory[key].tolist()
+                else:
+                    disk_lookups.setdefault(key, []).append(index)
+
+            if disk_lookups:
+                lookup_keys = list(disk_lookups)
+                for start in range(0, len(lookup_keys), 500):
+                    chunk = lookup_keys[start:start + 500]
+                    rows = self.connection.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f", blob)
+                        self._remember(key, vector)
+                        for index in disk_lookups[key]:
+                            found[index] = vector.tolist()
+                        self.disk_hits += len(disk_lookups[key])
+                    if rows:
+                        self.connection.executemany(
+                            "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                            [(time.time(), key) for key, _ in rows]
+                        )
+                self.connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text]).get(0)
+
+    def put_many(self, model: str, items: Sequence[tuple]):
+        """Store (text, vector) pairs in both tiers."""
+        now = time.time()
+        rows = []
+        with self.lock:
+            for text, vector in items:
+                key = self.key(model, text)
+                vector = array("f", vector)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+            for key, blob, _ in rows:
+                previous = self.connection.execute("SELECT LENGTH(vector) FROM embeddings WHERE key = ?", (key,)).fetchone()
+                self.disk_bytes += len(blob) - (previous[0] if previous else 0)
+            self.connection.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows)
+            self.connection.commit()
+            if self.disk_bytes > self.max_bytes:
+                self._evict()
+
+    def put(self, model: str, text: str, vector: List[float]):
+        self.put_many(model, [(text, vector)])
+
+    def _evict(self):
+        """Drop least recently used disk entries until the cache is 10% below its size limit."""
+        target = int(self.max_bytes * 0.9)
+        while self.disk_bytes > target:
+            rows = self.connection.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT 500"
+            ).fetchall()
+            if not rows:
+                self.disk_bytes = 0
+                break
+            evicted = []
+            for key, size in rows:
+                if self.disk_bytes <= target:
+                    break
+                evicted.append((key,))
+                self.disk_bytes -= size
+            self.connection.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+            self.evictions += len(evicted)
+        self.connection.commit()
+        logger.info(f"Embedding cache evicted down to {self.disk_bytes} bytes")
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self.memory),
+                "disk_bytes": self.disk_bytes,
+            }
+
+
+embedding_cache = EmbeddingCache(
+    path=config.EMBEDDING_CACHE_PATH,
+    max_bytes=config.EMBEDDING_CACHE_MAX_BYTES,
+    memory_entries=config.EMBEDDING_CACHE_MEMORY_ENTRIES
+)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from backend import config
+from backend.helpers.embedding_cache import embedding_cache, normalize_text
+from backend.helpers.single_flight import SingleFlight
+from backend.helpers.text_chunking import count_tokens
+from backend.interfaces.azure_ai_embeddings import (AsyncAzureOpenAI,
+                                                    AzureOpenAIError,
+                                                    get_openai_client)
+
+logger = logging.getLogger(__name__)
+
+
+def is_input_error(e: Exception) -> bool:
+    """The upstream service rejected the request itself (e.g. an input over the model's limit)."""
+    return isinstance(e, AzureOpenAIError) and e.status_code == 400
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching dispatcher: single-text embedding requests arriving within `window` seconds
+    of each other are sent upstream as one request, up to `max_size` texts or `max_tokens`
+    tokens, and each caller gets its own vector back.
+
+    If a batch fails with an error `split_on` accepts (e.g. one input the model rejects), its texts
+    are retried one by one so a single bad input does not fail everyone else's request.
+    """
+
+    def __init__(self, send: Callable[[List[str], int], Awaitable[List[List[float]]]],
+                 window: float, max_size: int, max_tokens: int,
+                 split_on: Callable[[Exception], bool] = lambda e: False):
+        self.send = send
+        self.split_on = split_on
+        self.window = window
+        self.max_size = max_size
+        self.max_tokens = max_tokens
+        self.pending: List[Tuple[str, int, asyncio.Future]] = []
+        self.pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.texts = 0
+
+    async def submit(self, text: str) -> List[float]:
+        future = asyncio.get_running_loop().create_future()
+        tokens = count_tokens(text)
+        if self.pending and self.pending_tokens + tokens > self.max_tokens:
+            self._flush()
+        self.pending.append((text, tokens, future))
+        self.pending_tokens += tokens
+        if len(self.pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending, self.pending_tokens = self.pending, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._send_batch(batch))
+            # Keep a reference so the task is not garbage collected mid-flight.
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, batch: List[Tuple[str, int, asyncio.Future]]):
+        self.batches += 1
+        self.texts += len(batch)
+        try:
+            vectors = await self.send([text for text, _, _ in batch], sum(tokens for _, tokens, _ in batch))
+        except Exception as e:
+            if len(batch) > 1 and self.split_on(e):
+                logger.warning(f"Embedding batch of {len(batch)} texts failed ({e}), retrying texts individually")
+                await asyncio.gather(*[self._send_batch([item]) for item in batch])
+                return
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for index, (_, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            vector = vectors[index] if index < len(vectors) else None
+            if vector is None:
+                # Never hand a caller None in place of its vector.
+                future.set_exception(AzureOpenAIError(f"Embedding response for {len(batch)} texts has no vector for input {index}"))
+            else:
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "average_batch_size": self.texts / self.batches if self.batches else 0.0,
+        }
+
+
+class EmbeddingService:
+    """
+    Non-blocking embeddings for the API through the shared upstream client, behind the embedding
+    cache, single-flight for identical concurrent texts and a micro-batching dispatcher for
+    different concurrent texts.
+    """
+
+    def __init__(self, model: str = config.OPENAI_EMBEDDING_MODEL, deployment: str = config.OPENAI_EMBEDDING_DEPLOYMENT,
+                 client: Optional[AsyncAzureOpenAI] = None):
+        self.model = model
+        self.deployment = deployment
+        self.flights = SingleFlight("embeddings")
+        self.batcher = EmbeddingBatcher(
+            self._create,
+            window=config.EMBEDDING_MICROBATCH_WINDOW_MS / 1000,
+            max_size=config.EMBEDDING_MICROBATCH_MAX_SIZE,
+            max_tokens=config.EMBEDDING_BATCH_MAX_TOKENS,
+            split_on=is_input_error
+        )
+        self._client = client
+
+    @property
+    def client(self) -> AsyncAzureOpenAI:
+        return self._client or get_openai_client()
+
+    async def _create(self, texts: List[str], tokens: Optional[int] = None) -> List[List[float]]:
+        """One embeddings request for `texts`, scheduled and retried on throttling."""
+        return await self.client.create_embeddings(self.deployment, texts, tokens=tokens)
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed one text. Concurrent calls for the same text share one request, and concurrent
+        calls for different texts are batched together.
+        """
+        # The cache is SQLite backed, keep its disk I/O off the event loop.
+        vector = await asyncio.to_thread(embedding_cache.get, self.model, text)
+        if vector is not None:
+            return vector
+
+        async def embed():
+            vector = await self.batcher.submit(text)
+            await asyncio.to_thread(embedding_cache.put, self.model, text, vector)
+            return vector
+
+        return await self.flights.do((self.model, normalize_text(text)), embed)
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several texts, sending all cache misses in a single embeddings request.
+        Raises if that request fails.
+        """
+        vectors = await asyncio.to_thread(embedding_cache.get_many, self.model, texts)
+        missing = list(dict.fromkeys(text for index, text in enumerate(texts) if index not in vectors))
+        if missing:
+            embedded = dict(zip(missing, await self._create(missing)))
+            await asyncio.to_thread(embedding_cache.put_many, self.model, list(embedded.items()))
+            for index, text in enumerate(texts):
+                if index not in vectors:
+                    vectors[index] = embedded[text]
+        return [vectors[index] for index in range(len(texts))]
+
+    def stats(self) -> dict:
+        return {"single_flight": self.flights.stats(), "micro_batching": self.batcher.stats()}
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,296 @@
+import asyncio
+import glob
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from backend import config
+from backend.helpers.rate_limiter import background_priority
+from backend.interfaces.http_client import close_http_client
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = {COMPLETED, FAILED, CANCELLED}
+
+
+def parse_csv_files(connection, csv_files: List[str], workers: int, chunksize: int, spill_dir: str):
+    """
+    Entry point of the CSV parsing process: sends the parsed tickets back one spill partition at a
+    time, then None (or the error). Sending blocks while the pipe is full, so parsing never runs
+    further ahead of the ingestion pipeline than the pipe buffer.
+    """
+    # Imported here so the API does not load pandas and the worker clients until the first import.
+    from workers.process_tickets_worker import iter_tickets
+
+    try:
+        for tickets_df in iter_tickets(csv_files, workers=workers, chunksize=chunksize, spill_dir=spill_dir):
+            connection.send(tickets_df)
+        connection.send(None)
+    except Exception as e:
+        # The original exception may not be picklable.
+        connection.send(RuntimeError(f"Parsing CSV files failed: {e}"))
+    finally:
+        connection.close()
+
+
+class ImportJob:
+    """
+    One historical ticket import. Progress is read live from the ingestion pipeline's stage
+    statistics, so status requests never block on the job itself.
+    """
+
+    def __init__(self, csv_files: List[str]):
+        self.id = uuid.uuid4().hex
+        self.csv_files = csv_files
+        self.state = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Tickets aggregated from the CSV rows and handed to the pipeline so far; complete once parsed_all is set.
+        self.tickets_parsed = 0
+        self.parsed_all = False
+        self.pipeline = None
+        self.task: Optional[asyncio.Task] = None
+
+    def progress(self) -> Dict[str, Optional[float]]:
+        progress = {"tickets_parsed": self.tickets_parsed, "skipped": 0, "embedded": 0, "uploaded": 0, "failed": 0, "eta_seconds": None}
+        if self.pipeline is None:
+            return progress
+
+        stats = self.pipeline.stats
+        progress.update({
+            "skipped": self.pipeline.skipped,
+            "embedded": stats["embed"].processed,
+            "uploaded": stats["upload"].processed - stats["upload"].failed,
+            "failed": stats["upload"].failed
+        })
+        if self.state == RUNNING and self.parsed_all:
+            remaining = self.tickets_parsed - self.pipeline.skipped - stats["upload"].processed
+            throughput = stats["upload"].throughput
+            if remaining <= 0:
+                progress["eta_seconds"] = 0.0
+            elif throughput > 0:
+                progress["eta_seconds"] = round(remaining / throughput, 1)
+        return progress
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "csv_files": self.csv_files,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(end - self.started_at, 1) if self.started_at else None,
+            "progress": self.progress(),
+            "error": self.error
+        }
+
+
+class ImportJobManager:
+    """
+    Runs historical ticket imports as background jobs in the API process. CSV parsing runs in
+    a child process and the ingestion pipeline on its own event loop in a dedicated thread.
+
+    At most `max_concurrent` jobs run at a time, further jobs wait in the queued state. Jobs
+    run with reduced parse and embed/upload concurrency, and their upstream calls go through the
+    process-wide rate limit schedulers at background priority, which caps them at
+    IMPORT_RATE_LIMIT_SHARE of each limit and keeps them from delaying the chat endpoints.
+    """
+
+    def __init__(self,
+                 csv_root: Path = config.IMPORT_CSV_ROOT,
+                 max_concurrent: int = config.IMPORT_MAX_CONCURRENT_JOBS,
+                 parse_workers: int = config.IMPORT_PARSE_WORKERS,
+                 embed_concurrency: int = config.IMPORT_EMBED_CONCURRENCY,
+                 upload_concurrency: int = config.IMPORT_UPLOAD_CONCURRENCY,
+                 history: int = config.IMPORT_JOB_HISTORY):
+        self.csv_root = Path(csv_root).resolve()
+        self.max_concurrent = max_concurrent
+        self.parse_workers = parse_workers
+        self.embed_concurrency = embed_concurrency
+        self.upload_concurrency = upload_concurrency
+        self.history = history
+        self.jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def resolve_csv_files(self, csv_folder_path: str) -> List[str]:
+        """
+        Resolve a folder (relative to the import root) to its CSV files. Raises ValueError for
+        folders outside the import root or without CSV files.
+        """
+        folder = (self.csv_root / csv_folder_path).resolve()
+        if folder != self.csv_root and self.csv_root not in folder.parents:
+            raise ValueError(f"CSV folder must be inside {self.csv_root}.")
+        csv_files = sorted(glob.glob(os.path.join(folder, "*.csv")))
+        if not csv_files:
+            raise ValueError(f"No CSV files found in {csv_folder_path}.")
+        return csv_files
+
+    def submit(self, csv_folder_path: str) -> ImportJob:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        job = ImportJob(self.resolve_csv_files(csv_folder_path))
+        self.jobs[job.id] = job
+        self._prune()
+        job.task = asyncio.create_task(self._run(job))
+        logger.info(f"Import job {job.id} queued for {len(job.csv_files)} CSV files")
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[ImportJob]:
+        return list(reversed(self.jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[ImportJob]:
+        job = self.jobs.get(job_id)
+        if job is not None and job.state not in FINISHED_STATES:
+            job.task.cancel()
+        return job
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the history limit."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    async def _run(self, job: ImportJob):
+        try:
+            async with self._semaphore:
+                job.state = RUNNING
+                job.started_at = time.time()
+                await self._import(job)
+            job.state = COMPLETED
+            logger.info(f"Import job {job.id} completed: {job.progress()}")
+        except asyncio.CancelledError:
+            job.state = CANCELLED
+            logger.info(f"Import job {job.id} cancelled: {job.progress()}")
+        except Exception as e:
+            job.state = FAILED
+            job.error = str(e)
+            logger.error(f"Import job {job.id} failed: {e}", exc_info=True)
+        finally:
+            job.finished_at = time.time()
+
+    async def shutdown(self):
+        """Cancel queued and running jobs and wait until they have stopped."""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _receive(job: ImportJob, receiver, process) -> Iterator:
+        """Yield the tickets sent by the parsing process. Runs on the pipeline's thread."""
+        while True:
+            try:
+                tickets_df = receiver.recv()
+            except EOFError:
+                process.join()
+                raise RuntimeError(f"CSV parsing process exited unexpectedly (exit code {process.exitcode})")
+            if tickets_df is None:
+                job.parsed_all = True
+                return
+            if isinstance(tickets_df, Exception):
+                raise tickets_df
+            job.tickets_parsed += len(tickets_df)
+            yield tickets_df
+
+    async def _import(self, job: ImportJob):
+        """
+        Parse the job's CSV files in a child process, so CPU-bound parsing never holds the API's GIL,
+        and stream its tickets into the ingestion pipeline as they are parsed. The process is spawned
+        rather than forked (forking a process that runs an event loop and other threads is not safe),
+        and terminated if the job is cancelled or the pipeline fails.
+        """
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        # The spill directory is owned here, a terminated process cannot clean up after itself.
+        with tempfile.TemporaryDirectory(prefix=f"import-{job.id[:8]}-") as spill_dir:
+            process = context.Process(
+                target=parse_csv_files,
+                args=(sender, job.csv_files, self.parse_workers, config.INGEST_CSV_CHUNK_SIZE, spill_dir),
+                name=f"import-parse-{job.id[:8]}"
+            )
+            process.start()
+            sender.close()
+            pipeline = asyncio.create_task(self._run_pipeline(job, self._receive(job, receiver, process)))
+            try:
+                await asyncio.shield(pipeline)
+            except asyncio.CancelledError:
+                # Stopping the parser first unblocks the pipeline thread waiting for the next tickets.
+                process.terminate()
+                pipeline.cancel()
+                await asyncio.wait([pipeline])
+                raise
+            finally:
+                if process.is_alive():
+                    process.terminate()
+                await asyncio.to_thread(process.join)
+                receiver.close()
+
+    async def _run_pipeline(self, job: ImportJob, frames: Iterable):
+        """
+        Run the ingestion pipeline in a dedicated thread with an event loop of its own, so its pandas
+        and serialization work never stalls the API's event loop. Cancelling the caller cancels the
+        pipeline and waits for it to stop.
+        """
+        from workers.process_tickets_worker import (IngestionPipeline,
+                                                    IngestManifest)
+
+        pipeline_task = None
+        cancelled = threading.Event()
+
+        async def run_pipeline():
+            nonlocal pipeline_task
+            pipeline_task = (asyncio.get_running_loop(), asyncio.current_task())
+            if cancelled.is_set():
+                return
+            manifest = IngestManifest()
+            try:
+                job.pipeline = IngestionPipeline(
+                    embed_concurrency=self.embed_concurrency,
+                    upload_concurrency=self.upload_concurrency,
+                    manifest=manifest
+                )
+                # Uploaded tickets are recorded in the manifest as they go, so a cancelled job resumes where it stopped.
+                # The pipeline's tasks inherit the background priority from this context.
+                with background_priority():
+                    await job.pipeline.run(frames)
+            finally:
+                manifest.close()
+                # The pooled connections belong to this thread's event loop, close them before it goes away.
+                await close_http_client()
+
+        thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"import-{job.id[:8]}")
+        future = asyncio.get_running_loop().run_in_executor(thread, asyncio.run, run_pipeline())
+        thread.shutdown(wait=False)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancelled.set()
+            if pipeline_task is not None:
+                loop, task = pipeline_task
+                loop.call_soon_threadsafe(task.cancel)
+            await asyncio.wait([future])
+            raise
+
+
+import_jobs = ImportJobManager()
@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Mapping, Optional, TypeVar
+
+import httpx
+from tenacity import (AsyncRetrying, RetryCallState, Retrying,
+                      retry_if_exception, stop_after_attempt)
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Buckets hold this many seconds' worth of capacity, allowing short bursts.
+BURST_SECONDS = 5
+
+# Set for calls made on behalf of background work (imports), see `background_priority`.
+background_calls: ContextVar[bool] = ContextVar("background_calls", default=False)
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse durations such as '20ms', '1s' or '6m0s' (OpenAI reset headers) or plain seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Read the server-requested delay from retry-after-ms or Retry-After (seconds only)."""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+def _response_of(exc: BaseException):
+    """Both httpx.HTTPStatusError and openai.APIStatusError carry the HTTP response."""
+    return getattr(exc, "response", None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    response = _response_of(exc)
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code in RETRYABLE_STATUS_CODES
+    # Connection failures and timeouts (httpx, or openai's APIConnectionError / APITimeoutError).
+    return isinstance(exc, httpx.TransportError) or type(exc).__name__ in {"APIConnectionError", "APITimeoutError"}
+
+
+@contextmanager
+def background_priority():
+    """
+    Schedule upstream calls made in this context, and in tasks started from it, as background
+    work: they are limited to the scheduler's background share and never delay interactive calls.
+    """
+    token = background_calls.set(True)
+    try:
+        yield
+    finally:
+        background_calls.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate` per second. Reservations may overdraw the
+    bucket; the caller is told how long to wait until its reservation is covered.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float, factor: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate * factor)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float, factor: float = 1.0) -> float:
+        self._refill(now, factor)
+        self.tokens -= amount
+        return max(0.0, -self.tokens / (self.rate * factor))
+
+    def drain(self, amount: float, now: float, factor: float = 1.0) -> float:
+        """
+        Take up to `amount` without overdrawing the bucket, so the call never delays later
+        reservations. Returns how long until earlier overdrawing reservations are covered.
+        """
+        self._refill(now, factor)
+        if self.tokens > 0:
+            self.tokens = max(0.0, self.tokens - amount)
+        return max(0.0, -self.tokens / (self.rate * factor))
+
+    def set_limit(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class RateLimitScheduler:
+    """
+    Shared scheduler for calls to one upstream service.
+
+    Callers reserve one request (and optionally an estimated number of tokens) before each call.
+    Limits start from configuration and are corrected from x-ratelimit-* response headers; a 429
+    or Retry-After pauses every caller and halves the sending rate, which then recovers gradually
+    on success. `run` / `run_sync` wrap a call with scheduling plus tenacity retries of throttled,
+    5xx and connection failures. Usable from threads and from the event loop.
+
+    Calls made under `background_priority` reserve from separate buckets holding `background_share`
+    of each limit, and only take what is left over from the shared buckets instead of overdrawing
+    them, so a large import batch never makes an interactive call wait.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: Optional[float] = None,
+                 max_attempts: int = 6, max_backoff: float = 60.0, background_share: float = 1.0):
+        self.name = name
+        self.background_share = background_share
+        self.requests = self._bucket(requests_per_minute)
+        self.background_requests = self._bucket(requests_per_minute * background_share)
+        self.tokens = self.background_tokens = None
+        if tokens_per_minute:
+            self.tokens = self._bucket(tokens_per_minute)
+            self.background_tokens = self._bucket(tokens_per_minute * background_share)
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.factor = 1.0
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(per_minute: float) -> TokenBucket:
+        return TokenBucket(per_minute / 60, max(1.0, per_minute / 60 * BURST_SECONDS))
+
+    def _reserve(self, tokens: float) -> float:
+        with self.lock:
+            now = time.monotonic()
+            if background_calls.get():
+                # Wait for the background share, and until interactive reservations are covered.
+                delay = max(self.background_requests.reserve(1, now, self.factor),
+                            self.requests.drain(1, now, self.factor))
+                if self.tokens is not None and tokens:
+                    delay = max(delay, self.background_tokens.reserve(tokens, now, self.factor),
+                                self.tokens.drain(tokens, now, self.factor))
+            else:
+                delay = self.requests.reserve(1, now, self.factor)
+                if self.tokens is not None and tokens:
+                    delay = max(delay, self.tokens.reserve(tokens, now, self.factor))
+            return max(delay, self.blocked_until - now)
+
+    async def acquire(self, tokens: float = 0):
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, tokens: float = 0):
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Adopt the limits and remaining quota reported by the upstream service."""
+        with self.lock:
+            now = time.monotonic()
+            buckets = (("requests", self.requests, self.background_requests),
+                       ("tokens", self.tokens, self.background_tokens))
+            for kind, bucket, background_bucket in buckets:
+                if bucket is None:
+                    continue
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                if limit and limit.isdigit() and float(limit) / 60 != bucket.rate:
+                    bucket.set_limit(float(limit))
+                    background_bucket.set_limit(float(limit) * self.background_share)
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining and remaining.isdigit():
+                    bucket._refill(now, self.factor)
+                    bucket.tokens = min(bucket.tokens, float(remaining))
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if int(remaining) == 0 and reset:
+                        self.blocked_until = max(self.blocked_until, now + reset)
+
+    def record_success(self):
+        with self.lock:
+            self.factor = min(1.0, self.factor + 0.05)
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """Slow down every caller after the upstream service throttled a request."""
+        with self.lock:
+            self.throttled += 1
+            self.factor = max(0.1, self.factor / 2)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        pause = f", pausing {retry_after:.1f}s" if retry_after else ""
+        logger.warning(f"{self.name} throttled, sending at {self.factor:.0%} of the limit{pause}")
+
+    def record_pause(self, retry_after: float):
+        """Hold every caller for the delay the upstream service asked for, without slowing down afterwards."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        logger.warning(f"{self.name} asked to retry after {retry_after:.1f}s, pausing")
+
+    def record_response(self, status_code: int, headers: Mapping[str, str]):
+        """Feed a raw HTTP response into the scheduler."""
+        self.update_from_headers(headers)
+        retry_after = retry_after_seconds(headers)
+        if status_code in (429, 503):
+            self.record_throttle(retry_after)
+        elif status_code in RETRYABLE_STATUS_CODES and retry_after:
+            # E.g. a 500 or 504 with Retry-After: not a throttle, but the retry must still wait.
+            self.record_pause(retry_after)
+
+    def _wait(self, retry_state: RetryCallState) -> float:
+        exc = retry_state.outcome.exception()
+        response = _response_of(exc)
+        if response is not None:
+            self.record_response(response.status_code, response.headers)
+            retry_after = retry_after_seconds(response.headers)
+            if retry_after is not None:
+                # The pause is enforced for all callers by `acquire`.
+                return 0
+        backoff = min(self.max_backoff, 0.5 * 2 ** (retry_state.attempt_number - 1))
+        return backoff * random.uniform(0.5, 1.0)
+
+    def _before_sleep(self, retry_state: RetryCallState):
+        logger.warning(f"{self.name} call failed ({retry_state.outcome.exception()}), "
+                       f"retrying (attempt {retry_state.attempt_number} of {self.max_attempts})")
+
+    def _retrying_options(self) -> dict:
+        return {
+            "stop": stop_after_attempt(self.max_attempts),
+            "wait": self._wait,
+            "retry": retry_if_exception(is_retryable),
+            "before_sleep": self._before_sleep,
+            "reraise": True,
+        }
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: float = 0) -> T:
+        """Schedule and retry an async upstream call."""
+        async for attempt in AsyncRetrying(**self._retrying_options()):
+            with attempt:
+                await self.acquire(tokens)
+                result = await call()
+        self.record_success()
+        return result
+
+    def run_sync(self, call: Callable[[], T], tokens: float = 0) -> T:
+        """Schedule and retry a blocking upstream call."""
+        for attempt in Retrying(**self._retrying_options()):
+            with attempt:
+                self.acquire_sync(tokens)
+                result = call()
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests_per_minute": self.requests.rate * 60,
+                "tokens_per_minute": self.tokens.rate * 60 if self.tokens is not None else None,
+                "background_share": self.background_share,
+                "rate_factor": self.factor,
+                "throttled": self.throttled,
+                "paused_for": max(0.0, self.blocked_until - time.monotonic()),
+            }
+
+
+openai_scheduler = RateLimitScheduler(
+    "OpenAI",
+    requests_per_minute=config.OPENAI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=config.OPENAI_TOKENS_PER_MINUTE,
+    background_share=config.IMPORT_RATE_LIMIT_SHARE
+)
+
+azure_search_scheduler = RateLimitScheduler(
+    "Azure AI Search",
+    requests_per_minute=config.AZURE_AI_SEARCH_REQUESTS_PER_MINUTE,
+    background_share=config.IMPORT_RATE_LIMIT_SHARE
+)
@@ -0,0 +1,140 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional, Tuple
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+
+class SearchResultCache:
+    """
+    In-process TTL + LRU cache for search results, bounded by entry count and approximate
+    (serialized) size.
+
+    Any process that changes the index calls `invalidate()`, which clears this process's entries
+    and touches a generation marker file. Other processes (the API when the worker ingests, and
+    vice versa) notice the marker's new mtime on their next lookup and drop their entries too.
+
+    The cache is shared between the API's event loop and the import pipeline threads, which
+    invalidate it after uploads, so all access to the entries goes through a lock.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, marker_path: Path):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.marker_path = Path(marker_path)
+        self.entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self.bytes = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._marker_mtime = self._read_marker()
+
+    def _read_marker(self) -> Optional[int]:
+        try:
+            return os.stat(self.marker_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _clear(self):
+        self.entries.clear()
+        self.bytes = 0
+        self.generation += 1
+
+    def _check_marker(self):
+        mtime = self._read_marker()
+        if mtime != self._marker_mtime:
+            self._marker_mtime = mtime
+            self.invalidations += 1
+            self._clear()
+
+    def _pop(self, key: Hashable):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a copy of the cached result, or None on a miss."""
+        with self._lock:
+            self._check_marker()
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, value = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        # Callers may modify results (e.g. collapse chunk hits), never hand out the cached object itself.
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Any, generation: int):
+        """
+        Store a result computed while the cache was at `generation`; results that raced with an
+        invalidation are dropped.
+        """
+        if generation != self.generation or self.ttl <= 0:
+            return
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self._pop(key)
+            self.entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop all cached results here and, via the marker file, in every other process."""
+        with self._lock:
+            self.invalidations += 1
+            self._clear()
+            try:
+                self.marker_path.parent.mkdir(parents=True, exist_ok=True)
+                self.marker_path.write_text(str(time.time_ns()))
+                self._marker_mtime = self._read_marker()
+            except OSError as e:
+                logger.warning(f"Could not update index generation marker {self.marker_path}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+            }
+
+
+search_cache = SearchResultCache(
+    ttl=config.SEARCH_CACHE_TTL_SECONDS,
+    max_entries=config.SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=config.SEARCH_CACHE_MAX_BYTES,
+    marker_path=config.SEARCH_INDEX_GENERATION_PATH
+)
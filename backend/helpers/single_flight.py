@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: while a call for a key is in flight, further callers
+    with the same key await the same task instead of starting their own. The key is released as
+    soon as the call finishes, so results are never reused after the fact.
+
+    Callers share the result object and must not modify it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls_started = 0
+        self.calls_shared = 0
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        # Mark the exception as retrieved in case every caller was cancelled before it finished.
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.calls_started += 1
+        else:
+            self.calls_shared += 1
+        # A caller giving up (e.g. a client disconnecting) must not cancel the call for the others.
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.calls),
+            "calls_started": self.calls_started,
+            "calls_shared": self.calls_shared,
+        }
@@ -0,0 +1,141 @@
+import json
+from typing import Any, AsyncIterator, List, Optional
+
+from fastapi.responses import StreamingResponse
+
+# Keep proxies (e.g. nginx) from buffering the stream and delaying the first token.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+class JsonStringFieldStream:
+    """
+    Incrementally extracts one string field from a JSON object that arrives in pieces, so the
+    field's text can be forwarded while the model is still generating the rest of the object.
+    `feed` returns the newly decoded part of the field (possibly empty).
+
+    Only a key of the top-level object counts: the incoming text is scanned for JSON structure,
+    so the field name appearing inside another string or in a nested object is not mistaken for it.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.buffer = ""
+        self.position: Optional[int] = None
+        self.done = False
+        # Scanner state while looking for the field, kept between chunks.
+        self.scan_position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.expect_key = False
+        self.key_start: Optional[int] = None
+        self.key: Optional[str] = None
+        self.expect_value = False
+
+    def _find_value(self) -> Optional[int]:
+        """Scan the new part of the buffer; return where the field's string value starts, if found."""
+        buffer = self.buffer
+        position = self.scan_position
+        while position < len(buffer):
+            char = buffer[position]
+            position += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.key_start is not None:
+                        try:
+                            self.key = json.loads(buffer[self.key_start:position])
+                        except ValueError:
+                            self.key = None
+                        self.key_start = None
+            elif self.depth == 0:
+                # Anything before the object (e.g. a code fence) is skipped.
+                if char == "{":
+                    self.depth = 1
+                    self.expect_key = True
+            elif char == '"':
+                if self.depth == 1 and self.expect_value and self.key == self.field:
+                    self.scan_position = position
+                    return position
+                if self.depth == 1 and self.expect_key:
+                    self.key_start = position - 1
+                    self.expect_key = False
+                self.in_string = True
+                self.expect_value = False
+            elif char in "{[":
+                self.depth += 1
+                self.expect_value = False
+            elif char in "}]":
+                self.depth -= 1
+            elif self.depth == 1 and char == ":":
+                self.expect_value = True
+            elif self.depth == 1 and char == ",":
+                self.expect_key = True
+                self.key = None
+            elif not char.isspace():
+                self.expect_value = False
+        self.scan_position = position
+        return None
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        self.buffer += chunk
+        if self.position is None:
+            self.position = self._find_value()
+            if self.position is None:
+                return ""
+
+        decoded: List[str] = []
+        buffer, position = self.buffer, self.position
+        while position < len(buffer):
+            char = buffer[position]
+            if char == '"':
+                self.done = True
+                break
+            if char != "\\":
+                decoded.append(char)
+                position += 1
+                continue
+            # Escape sequences may be split across chunks; wait for the rest before decoding.
+            if position + 1 >= len(buffer):
+                break
+            escape = buffer[position + 1]
+            if escape != "u":
+                decoded.append(JSON_ESCAPES.get(escape, escape))
+                position += 2
+                continue
+            if position + 6 > len(buffer):
+                break
+            code = int(buffer[position + 2:position + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # A high surrogate needs its low surrogate to form one character.
+                pair = buffer[position + 6:position + 12]
+                if len(pair) < 6 and "\\u".startswith(pair[:2]):
+                    break
+                low = int(pair[2:], 16) if pair.startswith("\\u") else None
+                if low is not None and 0xDC00 <= low < 0xE000:
+                    decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    position += 12
+                    continue
+            # Lone surrogates are kept as they are, like json.loads does.
+            decoded.append(chr(code))
+            position += 6
+        self.position = position
+        return "".join(decoded)
@@ -0,0 +1,60 @@
+import re
+from typing import List
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None  # Fall back to an approximate word/punctuation tokenizer
+
+# Fallback tokens: runs of at most 16 word characters, or single punctuation marks. Capping the
+# run length keeps long URLs or encoded blobs from counting as a single token.
+TOKEN_PATTERN = re.compile(r"\w{1,16}|[^\w\s]")
+
+ENCODING_NAME = "cl100k_base"
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding(ENCODING_NAME)
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, otherwise approximate them."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def chunk_text(text: str, max_tokens: int, overlap: int) -> List[str]:
+    """
+    Split text into chunks of at most `max_tokens` tokens, each overlapping the previous
+    chunk by `overlap` tokens. Returns an empty list for blank text.
+    """
+    if overlap >= max_tokens:
+        raise ValueError("overlap must be smaller than max_tokens")
+    if not text or not text.strip():
+        return []
+
+    step = max_tokens - overlap
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [
+            encoding.decode(tokens[start:start + max_tokens])
+            for start in range(0, max(len(tokens) - overlap, 1), step)
+        ]
+
+    # Slice the original text between token spans so whitespace and formatting are preserved.
+    spans = [match.span() for match in TOKEN_PATTERN.finditer(text)]
+    if not spans:
+        return []
+    chunks = []
+    for start in range(0, max(len(spans) - overlap, 1), step):
+        window = spans[start:start + max_tokens]
+        chunks.append(text[window[0][0]:window[-1][1]])
+    return chunks
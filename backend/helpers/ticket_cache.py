@@ -0,0 +1,97 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from backend.helpers.ticket_store import TicketStore, ticket_store
+
+logger = logging.getLogger(__name__)
+
+
+class TicketCache:
+    """
+    Process-wide in-memory copy of the ticket store, tagged with a version that increases on every
+    invalidation. Endpoints that change tickets call `invalidate()`; `watch()` picks up external
+    writers (JSON files dropped into TICKETS_DIR, other processes writing the store). Tickets are
+    loaded again on the first read after an invalidation, and the ticket context string for the
+    chat history is built at most once per version.
+    """
+
+    def __init__(self, store: TicketStore):
+        self.store = store
+        self.version = 0
+        self.loads = 0
+        self.lock = threading.Lock()
+        self._tickets: Optional[List[dict]] = None
+        self._by_id: Dict[str, dict] = {}
+        self._context: Optional[Tuple[int, str, int]] = None
+        self._data_version = store.data_version()
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+            self._tickets = None
+            self._context = None
+
+    def _load(self) -> List[dict]:
+        # Called with the lock held, so an invalidation cannot interleave with a load.
+        if self._tickets is None:
+            self._tickets = self.store.list()
+            self._by_id = {str(ticket["ticket_id"]): ticket for ticket in self._tickets}
+            self.loads += 1
+        return self._tickets
+
+    def list(self) -> List[dict]:
+        """All tickets, most recently updated first. Callers get copies they may modify."""
+        with self.lock:
+            return [dict(ticket) for ticket in self._load()]
+
+    def get(self, ticket_id: str) -> Optional[dict]:
+        with self.lock:
+            self._load()
+            ticket = self._by_id.get(str(ticket_id))
+        return dict(ticket) if ticket is not None else None
+
+    def context(self) -> Tuple[str, int]:
+        """The tickets serialized one JSON object per line for the chat history, and their count."""
+        with self.lock:
+            if self._context is None or self._context[0] != self.version:
+                tickets = self._load()
+                self._context = (self.version, "\n".join(json.dumps(ticket) for ticket in tickets), len(tickets))
+            return self._context[1], self._context[2]
+
+    def refresh(self) -> bool:
+        """
+        Import new or changed JSON files from TICKETS_DIR and check the store for writes by other
+        processes, invalidating the cache if anything changed. Returns True if it did.
+        """
+        imported = self.store.import_json_dir()
+        data_version = self.store.data_version()
+        changed = bool(imported) or data_version != self._data_version
+        self._data_version = data_version
+        if changed:
+            self.invalidate()
+        return changed
+
+    async def watch(self, interval: float):
+        """Poll for external changes every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Scanning the directory and querying SQLite block, keep them off the event loop.
+                if await asyncio.to_thread(self.refresh):
+                    logger.info(f"Tickets changed externally, ticket cache is now at version {self.version}")
+            except Exception as e:
+                logger.warning(f"Ticket watcher failed: {e}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "version": self.version,
+                "loads": self.loads,
+                "tickets": len(self._tickets) if self._tickets is not None else None,
+            }
+
+
+ticket_cache = TicketCache(ticket_store)
@@ -0,0 +1,158 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+
+class TicketStore:
+    """
+    Live support tickets in a SQLite file (WAL mode), one JSON document per ticket keyed by
+    ticket_id, with created/updated timestamps indexed for listing. Every create, update and
+    delete runs in its own transaction. Safe to use from multiple threads.
+
+    Tickets used to be stored as one JSON file each under TICKETS_DIR; `import_json_dir` brings
+    such files in. Imported files are remembered with their mtime, so a file is imported again
+    only after it changes and deleting a ticket does not bring its file back in.
+    """
+
+    def __init__(self, path: Path, tickets_dir: Path):
+        self.path = Path(path)
+        self.tickets_dir = Path(tickets_dir)
+        self.lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                ticket_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tickets_created_at ON tickets (created_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tickets_updated_at ON tickets (updated_at)")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS imported_files (
+                name TEXT PRIMARY KEY,
+                mtime REAL NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+    def get(self, ticket_id: str) -> Optional[dict]:
+        with self.lock:
+            row = self.connection.execute("SELECT data FROM tickets WHERE ticket_id = ?", (ticket_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self) -> List[dict]:
+        """All tickets, most recently updated first."""
+        with self.lock:
+            rows = self.connection.execute("SELECT data FROM tickets ORDER BY updated_at DESC").fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def create(self, ticket: dict) -> bool:
+        """Store a ticket, replacing any ticket with the same ticket_id. Returns True if it is new."""
+        ticket_id = str(ticket["ticket_id"])
+        now = time.time()
+        with self.lock, self.connection:
+            exists = self.connection.execute("SELECT 1 FROM tickets WHERE ticket_id = ?", (ticket_id,)).fetchone()
+            self.connection.execute(
+                "INSERT INTO tickets (ticket_id, data, created_at, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (ticket_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (ticket_id, json.dumps(ticket), now, now)
+            )
+        return exists is None
+
+    def update(self, ticket_id: str, fields: dict) -> Optional[dict]:
+        """Merge `fields` into a stored ticket and return the result, or None if there is no such ticket."""
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT data FROM tickets WHERE ticket_id = ?", (ticket_id,)).fetchone()
+            if row is None:
+                return None
+            ticket = json.loads(row[0])
+            ticket.update({key: value for key, value in fields.items() if key != "ticket_id"})
+            self.connection.execute(
+                "UPDATE tickets SET data = ?, updated_at = ? WHERE ticket_id = ?",
+                (json.dumps(ticket), time.time(), ticket_id)
+            )
+        return ticket
+
+    def delete(self, ticket_id: str) -> bool:
+        """Delete a ticket. Returns False if there was no such ticket."""
+        with self.lock, self.connection:
+            return self.connection.execute("DELETE FROM tickets WHERE ticket_id = ?", (ticket_id,)).rowcount > 0
+
+    @staticmethod
+    def _read_json_file(file: Path) -> Optional[Tuple[str, str]]:
+        try:
+            with file.open("r") as f:
+                ticket = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping ticket file {file}: {e}")
+            return None
+        if not isinstance(ticket, dict):
+            logger.warning(f"Skipping ticket file {file}: not a JSON object")
+            return None
+        ticket.setdefault("ticket_id", file.stem)
+        return str(ticket["ticket_id"]), json.dumps(ticket)
+
+    def import_json_dir(self, directory: Optional[Path] = None) -> int:
+        """
+        Import ticket JSON files from `directory` (TICKETS_DIR by default) that are new or changed
+        since they were last imported, replacing stored tickets with the same ticket_id. Returns the
+        number of tickets imported.
+        """
+        directory = Path(directory or self.tickets_dir)
+        with self.lock:
+            imported_mtimes = dict(self.connection.execute("SELECT name, mtime FROM imported_files").fetchall())
+        files = []
+        for file in sorted(directory.glob("*.json")):
+            try:
+                mtime = file.stat().st_mtime
+            except OSError:
+                continue
+            if imported_mtimes.get(str(file.resolve())) != mtime:
+                files.append((file, mtime))
+        if not files:
+            return 0
+
+        tickets = []
+        for file, mtime in files:
+            ticket = self._read_json_file(file)
+            if ticket is not None:
+                tickets.append((*ticket, mtime, mtime))
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO tickets (ticket_id, data, created_at, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (ticket_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                tickets
+            )
+            # Unreadable files are remembered too, they are retried once they change.
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO imported_files (name, mtime) VALUES (?, ?)",
+                [(str(file.resolve()), mtime) for file, mtime in files]
+            )
+        if tickets:
+            logger.info(f"Imported {len(tickets)} tickets from {directory}")
+        return len(tickets)
+
+    def data_version(self) -> int:
+        """Changes whenever another connection (e.g. another API process) commits to the store."""
+        with self.lock:
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+
+ticket_store = TicketStore(path=config.TICKET_STORE_PATH, tickets_dir=config.TICKETS_DIR)
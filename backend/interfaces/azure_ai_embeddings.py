@@ -1,12 +1,37 @@
-from typing import Any, Dict, List, Optional, Union
+import asyncio
+import base64
+import inspect
+import json
+import logging
+import time
+import weakref
+from array import array
+from functools import lru_cache
+from typing import (Any, AsyncIterator, Callable, Dict, List, Optional,
+                    Sequence, Tuple, TypeVar, Union)
 
+import httpx
 import requests
 
+from backend import config
+from backend.helpers.rate_limiter import RateLimitScheduler, openai_scheduler
+from backend.helpers.text_chunking import count_tokens
+from backend.interfaces.http_client import get_http_client
+
 try:
     from azure.identity import DefaultAzureCredential
 except ImportError:
     DefaultAzureCredential = None  # If azure.identity is not installed or needed
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+AAD_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+# Refresh Azure AD tokens this many seconds before they expire.
+TOKEN_REFRESH_MARGIN = 300
+
 
 class AzureOpenAI:
     def __init__(self, endpoint: str, api_version: str,
@@ -117,3 +142,267 @@ class AzureOpenAI:
         else:
             # If multiple inputs, return list of embedding vectors
             return embeddings
+
+
+def pack_embedding_batches(items: Sequence[T], max_inputs: int = config.EMBEDDING_BATCH_MAX_INPUTS,
+                           max_tokens: int = config.EMBEDDING_BATCH_MAX_TOKENS,
+                           text: Callable[[T], str] = lambda item: item) -> List[Tuple[List[T], int]]:
+    """
+    Pack items into embedding requests of at most `max_inputs` inputs and `max_tokens` tokens,
+    in order. `text` picks the text to embed from an item. Returns each batch with its token count.
+    """
+    batches = []
+    batch, batch_tokens = [], 0
+    for item in items:
+        tokens = count_tokens(text(item))
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            batches.append((batch, batch_tokens))
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        batches.append((batch, batch_tokens))
+    return batches
+
+
+class AzureOpenAIError(RuntimeError):
+    """
+    Error response from the upstream service. Carries the response so the rate limit
+    scheduler can retry 429/5xx and honour Retry-After.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, response: Optional[httpx.Response] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        err_info = response.json()
+    except ValueError:
+        return response.text or response.reason_phrase
+    if isinstance(err_info, dict) and "error" in err_info:
+        error = err_info["error"]
+        return (error.get("message") if isinstance(error, dict) else None) or str(error)
+    return str(err_info)
+
+
+def _decode_embedding(embedding: Union[str, List[float]]) -> List[float]:
+    """Embeddings requested as base64 arrive as packed float32 values."""
+    if isinstance(embedding, str):
+        return array("f", base64.b64decode(embedding)).tolist()
+    return embedding
+
+
+class AsyncAzureOpenAI:
+    """
+    Async client for Azure OpenAI (or the OpenAI API, provider="openai") on the shared keep-alive
+    connection pool. Azure AD tokens are refreshed before they expire, and every call goes through
+    the rate limit scheduler, which retries throttled (429), 5xx and connection failures with
+    Retry-After.
+    """
+
+    def __init__(self, endpoint: str, api_version: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 azure_credential: Optional[Any] = None,
+                 provider: str = "azure",
+                 http_client: Optional[httpx.AsyncClient] = None,
+                 scheduler: RateLimitScheduler = openai_scheduler):
+        """
+        :param endpoint: Azure OpenAI resource URL, e.g. 'https://<resource>.openai.azure.com/', or the
+            OpenAI API base URL, e.g. 'https://api.openai.com/v1', for provider="openai".
+        :param api_version: API version for Azure, e.g. '2024-10-21'. Not used by the OpenAI API.
+        :param api_key: (optional) API key.
+        :param azure_credential: (optional) Azure credential (from azure.identity or azure.identity.aio) for AAD auth.
+        :param provider: "azure" or "openai".
+        :param http_client: (optional) client to send requests with, defaults to the shared pool.
+        :param scheduler: rate limit scheduler shared by everything calling the same upstream quota.
+        """
+        if provider not in ("azure", "openai"):
+            raise ValueError(f"Unknown provider '{provider}', expected 'azure' or 'openai'.")
+        if not azure_credential and not api_key:
+            raise ValueError("Authentication required: provide an api_key or an azure_credential.")
+        self.endpoint = endpoint.rstrip("/")
+        self.api_version = api_version
+        self.api_key = api_key
+        self.azure_credential = azure_credential
+        self.provider = provider
+        self.scheduler = scheduler
+        self._http_client = http_client
+        self._token = None
+        # One lock per event loop, the client is shared by the API and background import jobs.
+        self._token_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client()
+
+    def _url(self, deployment: str, operation: str) -> str:
+        if self.provider == "openai":
+            return f"{self.endpoint}/{operation}"
+        return f"{self.endpoint}/openai/deployments/{deployment}/{operation}?api-version={self.api_version}"
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        if not self.azure_credential:
+            if self.provider == "openai":
+                return {"Authorization": f"Bearer {self.api_key}"}
+            return {"api-key": self.api_key}
+        token_lock = self._token_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+        async with token_lock:
+            if self._token is None or self._token.expires_on - TOKEN_REFRESH_MARGIN < time.time():
+                if inspect.iscoroutinefunction(self.azure_credential.get_token):
+                    self._token = await self.azure_credential.get_token(AAD_SCOPE)
+                else:
+                    # azure.identity's sync credentials may hit the network, keep them off the event loop.
+                    self._token = await asyncio.to_thread(self.azure_credential.get_token, AAD_SCOPE)
+            return {"Authorization": f"Bearer {self._token.token}"}
+
+    async def _send(self, deployment: str, operation: str, payload: Dict[str, Any],
+                    tokens: float = 0, stream: bool = False) -> httpx.Response:
+        """Send a POST to the deployment/operation, scheduled and retried. Raises AzureOpenAIError."""
+        if self.provider == "openai":
+            payload = {"model": deployment, **payload}
+        url = self._url(deployment, operation)
+
+        async def send(refreshed: bool = False) -> httpx.Response:
+            request = self.http_client.build_request("POST", url, json=payload, headers=await self._auth_headers())
+            response = await self.http_client.send(request, stream=stream)
+            self.scheduler.update_from_headers(response.headers)
+            if response.is_success:
+                return response
+            await response.aread()
+            await response.aclose()
+            if response.status_code == 401 and self.azure_credential and not refreshed:
+                # The token may have been revoked or rotated before its expiry, fetch a new one once.
+                self._token = None
+                return await send(refreshed=True)
+            raise AzureOpenAIError(f"Azure OpenAI API error (status {response.status_code}): {_error_message(response)}",
+                                   status_code=response.status_code, response=response)
+
+        try:
+            return await self.scheduler.run(send, tokens=tokens)
+        except httpx.TransportError as e:
+            raise AzureOpenAIError(f"Failed to connect to Azure OpenAI endpoint: {e}") from e
+
+    async def _request(self, deployment: str, operation: str, payload: Dict[str, Any], tokens: float = 0) -> Dict[str, Any]:
+        response = await self._send(deployment, operation, payload, tokens=tokens)
+        return response.json()
+
+    async def generate_text(self, deployment: str, prompt: str, **kwargs) -> str:
+        """
+        Generate a text completion using the specified deployed model.
+        :param deployment: Name of the deployment (the model deployment name in Azure OpenAI).
+        :param prompt: Prompt string to generate text from.
+        :param **kwargs: Additional parameters like max_tokens, temperature, top_p, etc.
+        :return: The generated completion text.
+        """
+        payload = {"prompt": prompt}
+        payload.update(kwargs)
+        result = await self._request(deployment, "completions", payload,
+                                     tokens=count_tokens(prompt) + kwargs.get("max_tokens", 0))
+        choice = result.get("choices", [{}])[0]
+        completion_text = choice.get("text")
+        if completion_text is None:
+            completion_text = choice.get("message", {}).get("content")
+        return completion_text
+
+    @staticmethod
+    def _chat_tokens(messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> int:
+        prompt_tokens = sum(count_tokens(message.get("content") or "") for message in messages)
+        return prompt_tokens + (kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or 0)
+
+    async def chat_completion(self, deployment: str, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        Get a chat completion (assistant response) for a conversation.
+        :param deployment: Name of the chat model deployment (e.g., GPT-4 or GPT-3.5 Turbo).
+        :param messages: List of message dicts, each with 'role' and 'content'.
+        :param **kwargs: Additional parameters like max_tokens, temperature, etc.
+        :return: The assistant's reply message content.
+        """
+        payload = {"messages": messages}
+        payload.update(kwargs)
+        result = await self._request(deployment, "chat/completions", payload, tokens=self._chat_tokens(messages, kwargs))
+        return result.get("choices", [{}])[0].get("message", {}).get("content")
+
+    async def chat_completion_stream(self, deployment: str, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding the assistant's reply in pieces as they are generated.
+        Only opening the stream is retried; an error mid-stream is raised to the caller.
+        :param deployment: Name of the chat model deployment.
+        :param messages: List of message dicts, each with 'role' and 'content'.
+        :param **kwargs: Additional parameters like max_tokens, temperature, etc.
+        """
+        payload = {"messages": messages}
+        payload.update(kwargs)
+        payload["stream"] = True
+        response = await self._send(deployment, "chat/completions", payload,
+                                    tokens=self._chat_tokens(messages, kwargs), stream=True)
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                # Azure sends content filter results as chunks without choices.
+                for choice in json.loads(data).get("choices", []):
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            await response.aclose()
+
+    async def create_embeddings(self, deployment: str, texts: List[str], tokens: Optional[float] = None) -> List[List[float]]:
+        """
+        Embed `texts` with a single request and return the vectors in input order.
+        :param deployment: Name of the embedding model deployment.
+        :param texts: Strings to embed, within the per-request input and token limits.
+        :param tokens: (optional) token count of `texts` for the rate limiter, counted if omitted.
+        """
+        if tokens is None:
+            tokens = sum(count_tokens(text) for text in texts)
+        # Base64 float32 vectors are a fraction of the size of JSON float lists.
+        result = await self._request(deployment, "embeddings", {"input": texts, "encoding_format": "base64"}, tokens=tokens)
+        vectors = [None] * len(texts)
+        for item in result.get("data", []):
+            vectors[item["index"]] = _decode_embedding(item["embedding"])
+        return vectors
+
+    async def get_embedding(self, deployment: str, text: Union[str, List[str]],
+                            max_inputs: int = config.EMBEDDING_BATCH_MAX_INPUTS,
+                            max_tokens: int = config.EMBEDDING_BATCH_MAX_TOKENS) -> Union[List[float], List[List[float]]]:
+        """
+        Retrieve embedding vector(s) for the given input text or texts. Lists are split into
+        requests of at most `max_inputs` texts and `max_tokens` tokens, sent concurrently.
+        :param deployment: Name of the embedding model deployment.
+        :param text: A string or a list of strings to embed.
+        :return: Embedding vector (list of floats) for single text, or list of vectors for list input.
+        """
+        if isinstance(text, str):
+            vectors = await self.create_embeddings(deployment, [text])
+            return vectors[0] if vectors else None
+
+        batches = pack_embedding_batches(text, max_inputs, max_tokens)
+        results = await asyncio.gather(*[self.create_embeddings(deployment, texts, tokens) for texts, tokens in batches])
+        return [vector for vectors in results for vector in vectors]
+
+
+@lru_cache
+def get_openai_client() -> AsyncAzureOpenAI:
+    """
+    The upstream client shared by the API and the ingestion worker, configured by OPENAI_PROVIDER.
+    """
+    if config.OPENAI_PROVIDER == "azure":
+        azure_credential = None
+        if config.AZURE_OPENAI_USE_AAD:
+            if DefaultAzureCredential is None:
+                raise RuntimeError("AZURE_OPENAI_USE_AAD needs the azure-identity package.")
+            azure_credential = DefaultAzureCredential()
+        return AsyncAzureOpenAI(
+            endpoint=config.OPENAI_ENDPOINT,
+            api_version=config.AZURE_OPENAI_MODEL_VERSION,
+            api_key=None if azure_credential else config.OPENAI_API_KEY,
+            azure_credential=azure_credential
+        )
+    return AsyncAzureOpenAI(endpoint=config.OPENAI_BASE_URL, api_key=config.CHATGPT_KEY, provider="openai")
@@ -1,9 +1,86 @@
+import asyncio
+import hashlib
+import json
+import logging
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import (AsyncIterator, Awaitable, Callable, Dict, List, Optional,
+                    Tuple, Union)
 from urllib.parse import quote
 
 import httpx
 
-from backend.api.api_v1.endpoints.llm_endpoints import vectorize_endpoint
-from backend.schemas.llm_schemas import TextToVector
+from backend import config
+from backend.helpers.embedding_cache import normalize_text
+from backend.helpers.embedding_service import embedding_service
+from backend.helpers.rate_limiter import azure_search_scheduler
+from backend.helpers.search_cache import search_cache
+from backend.helpers.single_flight import SingleFlight
+from backend.interfaces.http_client import create_http_client, get_http_client
+
+logger = logging.getLogger(__name__)
+
+# Azure AI Search accepts at most 1000 documents and 16 MB per indexing request.
+MAX_BATCH_DOCUMENTS = 1000
+MAX_BATCH_PAYLOAD_BYTES = 16 * 1024 * 1024
+
+# Indexing request bodies are assembled from individually serialized documents.
+INDEX_PAYLOAD_PREFIX = b'{"value":['
+INDEX_PAYLOAD_SUFFIX = b']}'
+
+INDEX_ACTIONS = {"upload", "merge", "mergeOrUpload", "delete"}
+
+# Search requests over-fetch by this factor so hits can be collapsed from chunks to parent tickets.
+CHUNK_OVERSAMPLE = 3
+
+# Pages of over-fetched hits searched at most to find top_k distinct tickets.
+MAX_COLLAPSE_PAGES = 4
+
+# Largest $skip Azure AI Search accepts; deeper pages are reached with key-range filters.
+MAX_SKIP = 100000
+
+# Shared by all clients in the process so identical concurrent searches go upstream once.
+search_flights = SingleFlight("azure_ai_search")
+
+# Fields needed to collapse chunk hits onto their parent ticket.
+CHUNK_FIELDS = ["parent_id", "doc_type", "chunk_index"]
+
+# Fields of a chunk hit that describe the chunk rather than its parent ticket.
+CHUNK_ONLY_FIELDS = {"parent_id", "chunk_index", "discussion"}
+
+# Status codes Azure reports for transient failures (worth re-queueing).
+RETRYABLE_STATUS_CODES = {409, 422, 429, 500, 502, 503, 504}
+
+
+def odata_literal(value: str) -> str:
+    """Quote a string for an OData filter, escaping embedded single quotes."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def odata_datetime(value: datetime) -> str:
+    """Format a datetime as an OData DateTimeOffset literal (naive datetimes are taken as UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def build_filter(company_name: Optional[List[str]] = None, team: Optional[List[str]] = None,
+                 priority: Optional[List[str]] = None, date_from: Optional[datetime] = None,
+                 date_to: Optional[datetime] = None) -> Optional[str]:
+    """
+    Build an OData $filter from field values (any of several values matches) and a
+    date_entered range. Returns None when nothing is filtered.
+    """
+    clauses = []
+    for field, values in (("company_name", company_name), ("team", team), ("priority", priority)):
+        if values:
+            clauses.append("(" + " or ".join(f"{field} eq {odata_literal(value)}" for value in values) + ")")
+    if date_from is not None:
+        clauses.append(f"date_entered ge {odata_datetime(date_from)}")
+    if date_to is not None:
+        clauses.append(f"date_entered le {odata_datetime(date_to)}")
+    return " and ".join(clauses) or None
 
 
 class AzureSearchClient:
@@ -13,7 +90,12 @@ class AzureSearchClient:
 
     def __init__(self, service_url: str, index_name: str, api_key: str,
                  vector_field: str, key_field: str = "id",
-                 api_version: str = "2024-07-01"):
+                 api_version: str = "2024-07-01",
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Requests go through the process-wide pooled HTTP client. The optional `transport` gives this
+        instance its own client instead, e.g. to run against an in-process stand-in of the search service.
+        """
         self.service_url = service_url
         self.api_key = api_key
         self.api_version = api_version
@@ -25,78 +107,311 @@ class AzureSearchClient:
             "Content-Type": "application/json",
             "api-key": api_key
         }
+        self.transport = transport
+        self._own_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self.transport is None:
+            return get_http_client()
+        if self._own_client is None or self._own_client.is_closed:
+            self._own_client = create_http_client(self.transport)
+        return self._own_client
 
     async def _post(self, url: str, json: dict):
-        """Helper function to make async POST requests."""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=self.headers, json=json)
+        """Helper function to make async POST requests, scheduled and retried on throttling."""
+        async def post():
+            response = await self.client.post(url, headers=self.headers, json=json)
+            azure_search_scheduler.update_from_headers(response.headers)
             response.raise_for_status()
             return response.json()
 
-    async def hybrid_search(self, text_query: str = None, embedding: list = None, top_k: int = 5):
-        """Perform hybrid search using both keyword and vector similarity."""
+        return await azure_search_scheduler.run(post)
+
+    def _select_clause(self, select: Optional[List[str]], collapse_chunks: bool = False) -> Optional[str]:
+        """
+        Build the $select value for a projection, always keeping the key field (and the chunk fields
+        when hits are collapsed). None means all retrievable fields.
+        """
+        if not select:
+            return None
+        fields = [self.key_field, *select, *(CHUNK_FIELDS if collapse_chunks else [])]
+        return ",".join(dict.fromkeys(fields))
+
+    def collapse_chunk_hits(self, results: dict, top_k: int) -> dict:
+        """
+        Collapse chunk hits onto their parent ticket, keeping the best-scoring hit per ticket
+        (results arrive in score order) and at most `top_k` tickets. Matching chunks are listed
+        under "matched_chunks" on the collapsed hit.
+
+        When a chunk outranks its parent, the ticket entry takes the chunk's score but only the
+        parent metadata the chunk carries; the chunk's own text, index and vector are left out,
+        and the parent's fields are filled in if the parent itself shows up further down.
+        """
+        collapsed = {}
+        for hit in results.get("value", []):
+            is_chunk = hit.get("doc_type") == "chunk"
+            parent_key = hit.get("parent_id") or hit.get(self.key_field)
+            entry = collapsed.get(parent_key)
+            if entry is None:
+                if len(collapsed) >= top_k:
+                    continue
+                if is_chunk:
+                    entry = {k: v for k, v in hit.items() if k not in CHUNK_ONLY_FIELDS and k != self.vector_field}
+                    entry.update({self.key_field: parent_key, "doc_type": "ticket"})
+                else:
+                    entry = dict(hit)
+                entry["matched_chunks"] = []
+                collapsed[parent_key] = entry
+            elif not is_chunk:
+                entry.update({k: v for k, v in hit.items() if not k.startswith("@search.")})
+            if is_chunk:
+                chunk = {"chunk_index": hit.get("chunk_index"), "@search.score": hit.get("@search.score")}
+                if "discussion" in hit:
+                    chunk["text"] = hit["discussion"]
+                entry["matched_chunks"].append(chunk)
+        results["value"] = list(collapsed.values())
+        return results
+
+    async def _search_collapsed(self, url: str, body: dict, top_k: int) -> dict:
+        """
+        Run a search and collapse its chunk hits onto tickets. When the over-fetched page holds
+        fewer than `top_k` distinct tickets (e.g. one ticket's chunks fill it), further pages are
+        fetched, up to MAX_COLLAPSE_PAGES. Tickets that only matched through chunks get their own
+        fields filled in from the parent documents, since chunks only carry the filter fields.
+        """
+        page_size = body["top"]
+        results = await self._post(url, body)
+        hits = list(results.get("value", []))
+        page = hits
+        for page_number in range(1, MAX_COLLAPSE_PAGES):
+            parents = {hit.get("parent_id") or hit.get(self.key_field) for hit in hits}
+            if len(page) < page_size or len(parents) >= top_k:
+                break
+            skip = page_number * page_size
+            page_body = {**body, "skip": skip}
+            if "vectorQueries" in body:
+                page_body["vectorQueries"] = [{**query, "k": skip + page_size} for query in body["vectorQueries"]]
+            page = (await self._post(url, page_body)).get("value", [])
+            hits.extend(page)
+
+        results["value"] = hits
+        seen_parents = {hit.get(self.key_field) for hit in hits if hit.get("doc_type") != "chunk"}
+        results = self.collapse_chunk_hits(results, top_k)
+        missing = [entry[self.key_field] for entry in results["value"] if entry[self.key_field] not in seen_parents]
+        if missing:
+            parents = await self._fetch_documents(url, missing, body.get("select"))
+            for entry in results["value"]:
+                parent = parents.get(entry[self.key_field])
+                if parent is not None:
+                    entry.update({k: v for k, v in parent.items() if not k.startswith("@search.")})
+        return results
+
+    async def _fetch_documents(self, url: str, keys: List[str], select: Optional[str]) -> Dict[str, dict]:
+        """Fetch documents by key with one search request, keyed by document key."""
+        body = {
+            "search": "*",
+            "filter": f"search.in({self.key_field}, {odata_literal(','.join(keys))}, ',')",
+            "top": len(keys)
+        }
+        if select:
+            body["select"] = select
+        results = await self._post(url, body)
+        return {document[self.key_field]: document for document in results.get("value", [])}
+
+    def _cache_key(self, mode: str, text_query: Optional[str], embedding: Optional[list], top_k: int,
+                   collapse_chunks: bool, select: Optional[List[str]], filter: Optional[str] = None,
+                   facets: Optional[List[str]] = None) -> tuple:
+        fingerprint = hashlib.sha1(array("f", embedding).tobytes()).hexdigest() if embedding is not None else None
+        query = normalize_text(text_query) if text_query else None
+        return (self.index_name, mode, query, fingerprint, top_k, bool(collapse_chunks), tuple(select or ()),
+                filter, tuple(facets or ()))
+
+    @staticmethod
+    def _apply_filter(body: dict, filter: Optional[str], facets: Optional[List[str]]):
+        """
+        Add $filter and facets to a search body. Vector queries are pre-filtered, so the nearest
+        neighbours are searched among the matching documents only rather than trimmed afterwards.
+        """
+        if filter:
+            body["filter"] = filter
+            if "vectorQueries" in body:
+                body["vectorFilterMode"] = "preFilter"
+        if facets:
+            body["facets"] = facets
+
+    async def _cached_search(self, key: tuple, search: Callable[[], Awaitable[dict]], cache: bool = True) -> dict:
+        """
+        Serve a search from the result cache, running `search` on a miss. Concurrent identical
+        searches share one upstream request.
+        """
+        if cache:
+            results = search_cache.get(key)
+            if results is not None:
+                return results
+        return await self._shared_search(key, search, cache)
+
+    async def _shared_search(self, key: tuple, search: Callable[[], Awaitable[dict]], cache: bool = True) -> dict:
+        async def fetch():
+            generation = search_cache.generation
+            results = await search()
+            if cache:
+                search_cache.put(key, results, generation)
+            return results
+
+        return await search_flights.do(key, fetch)
+
+    async def hybrid_search(self, text_query: str = None, embedding: list = None, top_k: int = 5,
+                            collapse_chunks: bool = True, select: Optional[List[str]] = None,
+                            filter: Optional[str] = None, facets: Optional[List[str]] = None,
+                            cache: bool = True):
+        """
+        Perform hybrid search using both keyword and vector similarity. `select` limits the
+        returned fields (all retrievable fields by default), `filter` is an OData $filter
+        (see build_filter), `facets` lists fields to count values for, and `cache` toggles
+        the result cache.
+        """
         url = f"{self.base_url}/indexes/{self.index_name}/docs/search?api-version={self.api_version}"
+        k = top_k * CHUNK_OVERSAMPLE if collapse_chunks else top_k
         body = {
             "search": text_query or "*",
-            "top": top_k
+            "top": k
         }
+        if select:
+            body["select"] = self._select_clause(select, collapse_chunks)
         if embedding is not None:
             body["vectorQueries"] = [
                 {
                     "kind": "vector",
                     "fields": self.vector_field,
                     "vector": embedding,
-                    "k": top_k
+                    "k": k
                 }
             ]
-        return await self._post(url, body)
+        self._apply_filter(body, filter, facets)
+
+        async def search():
+            if collapse_chunks:
+                return await self._search_collapsed(url, body, top_k)
+            return await self._post(url, body)
 
-    async def fulltext_search(self, text_query: str, top_k: int = 5):
+        key = self._cache_key("hybrid", text_query, embedding, top_k, collapse_chunks, select, filter, facets)
+        return await self._cached_search(key, search, cache)
+
+    async def fulltext_search(self, text_query: str, top_k: int = 5, collapse_chunks: bool = True,
+                              select: Optional[List[str]] = None, filter: Optional[str] = None,
+                              facets: Optional[List[str]] = None, cache: bool = True):
         """Perform a full-text search using keyword search only."""
         url = f"{self.base_url}/indexes/{self.index_name}/docs/search?api-version={self.api_version}"
         body = {
             "search": text_query,
-            "top": top_k
+            "top": top_k * CHUNK_OVERSAMPLE if collapse_chunks else top_k
         }
-        return await self._post(url, body)
+        if select:
+            body["select"] = self._select_clause(select, collapse_chunks)
+        self._apply_filter(body, filter, facets)
+
+        async def search():
+            if collapse_chunks:
+                return await self._search_collapsed(url, body, top_k)
+            return await self._post(url, body)
 
-    async def vector_search(self, embedding: list, top_k: int = 5):
+        key = self._cache_key("fulltext", text_query, None, top_k, collapse_chunks, select, filter, facets)
+        return await self._cached_search(key, search, cache)
+
+    async def vector_search(self, embedding: list, top_k: int = 5, collapse_chunks: bool = True,
+                            select: Optional[List[str]] = None, filter: Optional[str] = None,
+                            facets: Optional[List[str]] = None, cache: bool = True):
         """Perform a vector-based search using similarity matching."""
         url = f"{self.base_url}/indexes/{self.index_name}/docs/search?api-version={self.api_version}"
+        k = top_k * CHUNK_OVERSAMPLE if collapse_chunks else top_k
         body = {
+            "top": k,
             "vectorQueries": [
                 {
                     "kind": "vector",
                     "fields": self.vector_field,
                     "vector": embedding,
-                    "k": top_k
+                    "k": k
                 }
             ]
         }
-        return await self._post(url, body)
+        if select:
+            body["select"] = self._select_clause(select, collapse_chunks)
+        self._apply_filter(body, filter, facets)
 
-    async def query_with_vectorization(self, text_query: str, top_k: int = 5):
-        """Perform a hybrid search query with vectorization."""
-        vector_response = await vectorize_endpoint(TextToVector(text=text_query))
-        embedding = vector_response["vector"]
-        return await self.hybrid_search(text_query=text_query, embedding=embedding, top_k=top_k)
+        async def search():
+            if collapse_chunks:
+                return await self._search_collapsed(url, body, top_k)
+            return await self._post(url, body)
 
-    # XXX TODO chunking...
-    async def upload_document(self, doc_id: str, embedding: list, metadata: dict):
+        key = self._cache_key("vector", None, embedding, top_k, collapse_chunks, select, filter, facets)
+        return await self._cached_search(key, search, cache)
+
+    async def query_with_vectorization(self, text_query: str, top_k: int = 5, collapse_chunks: bool = True,
+                                       select: Optional[List[str]] = None, filter: Optional[str] = None,
+                                       facets: Optional[List[str]] = None, cache: bool = True):
         """
-        Upload a single document (or update if ID exists) with vector and metadata.
+        Perform a hybrid search query with vectorization. A cache hit skips both the embedding
+        and the search request.
+        """
+        async def search():
+            embedding = await embedding_service.embed(text_query)
+            return await self.hybrid_search(text_query=text_query, embedding=embedding, top_k=top_k,
+                                            collapse_chunks=collapse_chunks, select=select, filter=filter,
+                                            facets=facets, cache=False)
 
-        Parameters:
-        - doc_id: Unique identifier for the document (matches index key field).
-        - embedding: List of floats (vector) from the embedding model (length 1536 for ada-002).
-        - metadata: Dictionary of other fields/values to store with the document.
+        key = self._cache_key("hybrid_vectorized", text_query, None, top_k, collapse_chunks, select, filter, facets)
+        return await self._cached_search(key, search, cache)
 
-        Returns:
-        - True if upload succeeded, raises exception on failure.
+    async def query_many_with_vectorization(self, text_queries: List[str], top_k: int = 5,
+                                            collapse_chunks: bool = True, select: Optional[List[str]] = None,
+                                            filter: Optional[str] = None, facets: Optional[List[str]] = None,
+                                            concurrency: int = config.SEARCH_BATCH_CONCURRENCY) -> List[Union[dict, Exception]]:
         """
-        # Construct the document payload according to Azure schema.
+        Run query_with_vectorization for many queries at once: cached queries are answered
+        directly, the rest are embedded in a single embeddings request and searched with at most
+        `concurrency` searches in flight.
+
+        Returns one entry per query, in order: the search results, or the exception that query
+        failed with.
+        """
+        keys = [self._cache_key("hybrid_vectorized", query, None, top_k, collapse_chunks, select, filter, facets)
+                for query in text_queries]
+        results: List[Union[dict, Exception, None]] = [search_cache.get(key) for key in keys]
+        pending = [index for index, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        try:
+            embeddings = await embedding_service.embed_many([text_queries[index] for index in pending])
+        except Exception as e:
+            logger.error(f"Error vectorizing {len(pending)} batch queries: {e}")
+            for index in pending:
+                results[index] = e
+            return results
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(index: int, embedding: list):
+            async def search():
+                return await self.hybrid_search(text_query=text_queries[index], embedding=embedding, top_k=top_k,
+                                                collapse_chunks=collapse_chunks, select=select, filter=filter,
+                                                facets=facets, cache=False)
+
+            async with semaphore:
+                try:
+                    results[index] = await self._shared_search(keys[index], search)
+                except Exception as e:
+                    results[index] = e
+
+        await asyncio.gather(*(run(index, embedding) for index, embedding in zip(pending, embeddings)))
+        return results
+
+    def build_document(self, doc_id: str, embedding: list, metadata: dict, action: str = "upload") -> dict:
+        """Construct the document payload according to Azure schema."""
         document = {
-            "@search.action": "upload",  # upsert behavior
+            "@search.action": action,
             self.key_field: doc_id,
             self.vector_field: embedding
         }
@@ -105,57 +420,259 @@ class AzureSearchClient:
             if k in document and k not in {self.key_field, self.vector_field}:
                 raise ValueError(f"Metadata key '{k}' conflicts with reserved field names.")
             document[k] = v
+        return document
+
+    async def upload_document(self, doc_id: str, embedding: list, metadata: dict):
+        """
+        Upload a single document (or update if ID exists) with vector and metadata.
+
+        Parameters:
+        - doc_id: Unique identifier for the document (matches index key field).
+        - embedding: List of floats (vector) from the embedding model (length 1536 for ada-002).
+        - metadata: Dictionary of other fields/values to store with the document.
 
+        Returns:
+        - True if upload succeeded, raises exception on failure.
+        """
+        document = self.build_document(doc_id, embedding, metadata)
         payload = {"value": [document]}
         url = f"{self.base_url}/indexes/{self.index_name}/docs/index?api-version={self.api_version}"
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=self.headers, json=payload)
+
+        async def post():
+            response = await self.client.post(url, headers=self.headers, json=payload)
+            azure_search_scheduler.update_from_headers(response.headers)
             response.raise_for_status()  # Raise HTTP errors (4xx, 5xx).
+            return response
+
+        response = await azure_search_scheduler.run(post)
+        search_cache.invalidate()
+
+        # Azure responds with status per document in 'value' array.
+        result = response.json()
+        if ("value" in result and len(result["value"]) > 0
+                and result["value"][0].get("status") is True):  # NoQA
+            return True
+        else:
+            err = result["value"][0] if "value" in result and result["value"] else result
+            raise RuntimeError(f"Upload error: {err}")
+
+    def _encode_documents(self, documents: List[dict], action: str) -> List[Tuple[str, bytes]]:
+        """Serialize each document once, as (document key, JSON bytes) with the index action set."""
+        encoded = []
+        for document in documents:
+            if action == "delete":
+                document = {self.key_field: document[self.key_field]}
+            document = {**document, "@search.action": action}
+            encoded.append((document[self.key_field], json.dumps(document, default=str).encode("utf-8")))
+        return encoded
 
-            # Azure responds with status per document in 'value' array.
-            result = response.json()
-            if ("value" in result and len(result["value"]) > 0
-                    and result["value"][0].get("status") is True):  # NoQA
-                return True
-            else:
-                err = result["value"][0] if "value" in result and result["value"] else result
-                raise RuntimeError(f"Upload error: {err}")
-
-    async def get_document(self, doc_id: str):
-        """Retrieve a document by its ID."""
+    @staticmethod
+    def _build_batches(encoded: List[Tuple[str, bytes]], batch_size: int,
+                       max_payload_bytes: int) -> List[Tuple[List[Tuple[str, bytes]], bytes]]:
+        """
+        Pack encoded documents into /docs/index request bodies bounded by document count and byte
+        size. Returns each batch's documents together with its ready-to-send payload.
+        """
+        envelope = len(INDEX_PAYLOAD_PREFIX) + len(INDEX_PAYLOAD_SUFFIX)
+        batches = []
+        batch = []
+        batch_bytes = envelope
+        for item in encoded:
+            # Every document after the first adds a separating comma.
+            size = len(item[1]) + (1 if batch else 0)
+            if batch and (len(batch) >= batch_size or batch_bytes + size > max_payload_bytes):
+                batches.append(batch)
+                batch = []
+                batch_bytes = envelope
+                size -= 1
+            batch.append(item)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return [
+            (batch, INDEX_PAYLOAD_PREFIX + b",".join(data for _, data in batch) + INDEX_PAYLOAD_SUFFIX)
+            for batch in batches
+        ]
+
+    async def _index_batch(self, url: str, keys: List[str], payload: bytes) -> Dict[str, dict]:
+        """
+        Send one pre-serialized /docs/index request and return the per-document status entries that
+        failed, keyed by document key. A failed request marks every document in the batch as failed.
+        """
+        await azure_search_scheduler.acquire()
+        try:
+            response = await self.client.post(url, headers={**self.headers, "Content-Type": "application/json"}, content=payload)
+        except httpx.HTTPError as e:
+            return {key: {"statusCode": 503, "errorMessage": str(e)} for key in keys}
+        azure_search_scheduler.record_response(response.status_code, response.headers)
+        if response.status_code not in (200, 207):
+            error = {"statusCode": response.status_code, "errorMessage": response.text}
+            return {key: error for key in keys}
+
+        azure_search_scheduler.record_success()
+        failed = {}
+        for item in response.json().get("value", []):
+            if item.get("status") is not True:
+                failed[item.get("key")] = item
+        return failed
+
+    async def upload_documents(self, documents: List[dict], action: str = "upload",
+                               batch_size: int = MAX_BATCH_DOCUMENTS,
+                               max_payload_bytes: int = MAX_BATCH_PAYLOAD_BYTES,
+                               max_retries: int = 3) -> Dict[str, str]:
+        """
+        Index many documents with as few /docs/index calls as possible. Documents are serialized
+        once, off the event loop, and batches are packed by their serialized size.
+
+        Parameters:
+        - documents: Documents to index, each containing the key field. Any "@search.action"
+          already present is overwritten with `action`.
+        - action: One of "upload", "merge", "mergeOrUpload" or "delete".
+        - batch_size: Maximum number of documents per request (Azure caps this at 1000).
+        - max_payload_bytes: Maximum serialized size of a single request.
+        - max_retries: How many times documents that failed with a transient status are re-queued.
+
+        Returns:
+        - Dictionary of document key -> error message for documents that could not be indexed.
+        """
+        if action not in INDEX_ACTIONS:
+            raise ValueError(f"Unsupported index action '{action}', expected one of {sorted(INDEX_ACTIONS)}.")
+
+        pending = await asyncio.to_thread(self._encode_documents, documents, action)
+
+        url = f"{self.base_url}/indexes/{self.index_name}/docs/index?api-version={self.api_version}"
+        errors = {}
+        for attempt in range(max_retries + 1):
+            retry = []
+            batches = await asyncio.to_thread(self._build_batches, pending, batch_size, max_payload_bytes)
+            for batch, payload in batches:
+                failed = await self._index_batch(url, [key for key, _ in batch], payload)
+                for item in batch:
+                    key = item[0]
+                    if key not in failed:
+                        errors.pop(key, None)
+                        continue
+                    errors[key] = failed[key].get("errorMessage") or str(failed[key])
+                    if failed[key].get("statusCode") in RETRYABLE_STATUS_CODES:
+                        retry.append(item)
+            if not retry or attempt == max_retries:
+                break
+            logger.warning(f"Re-queueing {len(retry)} documents after transient indexing failures")
+            await asyncio.sleep(2 ** attempt)
+            pending = retry
+
+        search_cache.invalidate()
+        if errors:
+            logger.error(f"Failed to index {len(errors)} of {len(documents)} documents")
+        return errors
+
+    async def get_document(self, doc_id: str, select: Optional[List[str]] = None):
+        """Retrieve a document by its ID, optionally only the `select` fields."""
         key_param = quote(doc_id, safe='')
         url = f"{self.base_url}/indexes/{self.index_name}/docs/{key_param}?api-version={self.api_version}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers)
+        if select:
+            url += f"&$select={quote(self._select_clause(select), safe=',')}"
+
+        async def get():
+            response = await self.client.get(url, headers=self.headers)
+            azure_search_scheduler.update_from_headers(response.headers)
             if response.status_code == 404:
                 return None
             response.raise_for_status()
             return response.json()
 
-    async def list_documents(self, batch_size: int = 1000, limit: int = None, offset: int = 0):
-        """List documents in the index with optional limit and offset."""
-        all_docs = []
-        skip = offset
-        while True:
-            top = batch_size
-            if limit is not None:
-                remaining = limit - len(all_docs)
-                if remaining <= 0:
+        return await azure_search_scheduler.run(get)
+
+    def _key_range_filter(self, last_key: Optional[str]) -> Optional[str]:
+        if last_key is None:
+            return None
+        escaped = last_key.replace("'", "''")
+        return f"{self.key_field} gt '{escaped}'"
+
+    async def _list_page(self, top: int, last_key: Optional[str] = None, skip: int = 0,
+                         select: Optional[List[str]] = None) -> List[dict]:
+        """Fetch one page of documents in key order, starting after `last_key`."""
+        url = f"{self.base_url}/indexes/{self.index_name}/docs/search?api-version={self.api_version}"
+        body = {
+            "search": "*",
+            "select": self._select_clause(select) or "*",
+            "orderby": f"{self.key_field} asc",
+            "top": top
+        }
+        if last_key is not None:
+            body["filter"] = self._key_range_filter(last_key)
+        if skip:
+            body["skip"] = skip
+        results = await self._post(url, body)
+        return results.get("value", [])
+
+    async def _produce_pages(self, queue: asyncio.Queue, batch_size: int, limit: Optional[int], offset: int,
+                             select: Optional[List[str]]):
+        """
+        Fetch pages into `queue` using key-range paging. Ends with None, or with the exception
+        that stopped it.
+        """
+        try:
+            last_key = None
+            skip = offset
+            # Azure caps skip, so deep offsets are walked by key, fetching keys only.
+            while skip > MAX_SKIP:
+                keys = await self._list_page(min(batch_size, skip), last_key, select=[self.key_field])
+                if not keys:
+                    await queue.put(None)
+                    return
+                last_key = keys[-1][self.key_field]
+                skip -= len(keys)
+
+            fetched = 0
+            while limit is None or fetched < limit:
+                top = batch_size if limit is None else min(batch_size, limit - fetched)
+                page = await self._list_page(top, last_key, skip=skip, select=select)
+                skip = 0
+                if not page:
                     break
-                top = min(batch_size, remaining)
-            url = f"{self.base_url}/indexes/{self.index_name}/docs/search?api-version={self.api_version}"
-            body = {
-                "search": "*",
-                "select": "*",
-                "top": top,
-                "skip": skip
-            }
-            results = await self._post(url, body)
-            docs = results.get("value", [])
-            if not docs:
-                break
-            all_docs.extend(docs)
-            if len(docs) < top:
-                break
-            skip += top
-        return all_docs[:limit] if limit else all_docs
+                last_key = page[-1][self.key_field]
+                fetched += len(page)
+                await queue.put(page)
+                if len(page) < top:
+                    break
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    async def iter_documents(self, batch_size: int = 1000, limit: Optional[int] = None, offset: int = 0,
+                             select: Optional[List[str]] = None, prefetch: int = 1) -> AsyncIterator[dict]:
+        """
+        Yield the documents in the index in key order, page by page.
+
+        Pages are fetched by a background task up to `prefetch` pages ahead of the consumer, so the
+        next request is in flight while the current page is processed. Only those pages are held in
+        memory. Paging filters on the last key seen rather than using skip, so there is no 100k limit.
+        """
+        queue = asyncio.Queue(maxsize=max(1, prefetch))
+        producer = asyncio.create_task(self._produce_pages(queue, batch_size, limit, offset, select))
+        try:
+            while (page := await queue.get()) is not None:
+                if isinstance(page, Exception):
+                    raise page
+                for doc in page:
+                    yield doc
+        finally:
+            producer.cancel()
+
+    async def list_documents(self, batch_size: int = 1000, limit: int = None, offset: int = 0,
+                             select: Optional[List[str]] = None):
+        """List documents in the index with optional limit, offset and field projection."""
+        return [doc async for doc in self.iter_documents(batch_size=batch_size, limit=limit, offset=offset, select=select)]
+
+
+@lru_cache(maxsize=None)
+def get_search_client(index_name: str = "ticket_index") -> AzureSearchClient:
+    """Return the configured client for `index_name`, shared by everything in the process."""
+    return AzureSearchClient(
+        service_url=config.AZURE_AI_SEARCH_SERVICE,
+        index_name=index_name,
+        api_key=config.AZURE_AI_SEARCH_API_KEY,
+        api_version=config.AZURE_AI_SEARCH_API_VERSION,
+        vector_field="vector"
+    )
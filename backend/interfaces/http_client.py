@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import weakref
+from typing import Optional
+
+import httpx
+
+from backend import config
+
+try:
+    import h2
+except ImportError:
+    h2 = None  # HTTP/2 needs the optional h2 package (pip install httpx[http2])
+
+logger = logging.getLogger(__name__)
+
+# One pool per event loop: connections belong to the loop that opened them, and background
+# import jobs run the ingestion pipeline on a loop of their own.
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    Build a keep-alive connection pool for upstream services, negotiating HTTP/2 when the
+    h2 package is installed and HTTP2_ENABLED is set.
+    """
+    return httpx.AsyncClient(
+        http2=config.HTTP2_ENABLED and h2 is not None,
+        limits=httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+        transport=transport
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the pooled client of the running event loop. The API opens and closes it in its lifespan
+    handler; scripts such as the ingestion worker get one lazily on first use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _http_clients[loop] = create_http_client()
+        logger.info(f"Opened shared HTTP client (HTTP/2 {'enabled' if config.HTTP2_ENABLED and h2 is not None else 'disabled'})")
+    return client
+
+
+async def close_http_client():
+    """Close the pooled client of the running event loop."""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+        logger.info("Closed shared HTTP client")
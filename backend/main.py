@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,6 +13,9 @@ from starlette.middleware.sessions import SessionMiddleware
 from backend import config
 from backend.api.api_v1.routers import api_router
 from backend.decorators import log_endpoint
+from backend.helpers.import_jobs import import_jobs
+from backend.helpers.ticket_cache import ticket_cache
+from backend.interfaces.http_client import close_http_client, get_http_client
 
 API_V1_STR = "/api/v1"
 
@@ -26,11 +31,30 @@ logger.setLevel(logging.INFO)
 setup_logging()
 logging.getLogger("kernel").setLevel(logging.DEBUG)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One keep-alive connection pool per process for Azure AI Search and OpenAI embedding calls.
+    get_http_client()
+    # Bring in tickets still stored (or dropped) as JSON files under TICKETS_DIR, and keep watching for them.
+    ticket_cache.refresh()
+    watcher = None
+    if config.TICKET_WATCH_INTERVAL_SECONDS > 0:
+        watcher = asyncio.create_task(ticket_cache.watch(config.TICKET_WATCH_INTERVAL_SECONDS))
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    # Stop background imports before their connections and the event loop go away.
+    await import_jobs.shutdown()
+    await close_http_client()
+
+
 app = FastAPI(
     title="COD8 Neural IT Support Tickets API",
     openapi_url=f"{API_V1_STR}/openapi.json",
     docs_url="/docs",
-    redoc_url="/redocs"
+    redoc_url="/redocs",
+    lifespan=lifespan
 )
 
 # Configure CORS
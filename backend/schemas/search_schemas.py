@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 10
+    collapse_chunks: bool = True
+    include_vector: bool = False
+    fields: Optional[List[str]] = None
+    facets: Optional[List[str]] = None
+    company_name: Optional[List[str]] = None
+    team: Optional[List[str]] = None
+    priority: Optional[List[str]] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
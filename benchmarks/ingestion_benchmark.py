@@ -0,0 +1,238 @@
+"""
+Ingestion benchmark for workers/process_tickets_worker.py.
+
+Generates synthetic ticket CSV exports and runs the full worker pipeline (parse -> embed -> upload)
+against in-process stand-ins for the OpenAI embeddings API and the Azure AI Search /docs/index API,
+with configurable latency and error rates. No credentials, quota or network access are used.
+
+    python benchmarks/ingestion_benchmark.py --tickets 20000 --embed-latency-ms 200 --embed-error-rate 0.02
+
+Reports tickets/s, peak RSS and per-stage timings; --json prints the same numbers as one JSON object
+so runs can be compared in CI.
+"""
+import argparse
+import asyncio
+import atexit
+import base64
+import csv
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Keep the benchmark away from the real cache, manifest and index generation, and out of the rate limiter's way.
+BENCH_DIR = tempfile.mkdtemp(prefix="ingestion-benchmark-")
+atexit.register(shutil.rmtree, BENCH_DIR, ignore_errors=True)
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(BENCH_DIR, "embedding_cache.sqlite3")
+os.environ["INGEST_MANIFEST_PATH"] = os.path.join(BENCH_DIR, "ingest_manifest.sqlite3")
+os.environ["SEARCH_INDEX_GENERATION_PATH"] = os.path.join(BENCH_DIR, "index_generation")
+os.environ.setdefault("OPENAI_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("OPENAI_TOKENS_PER_MINUTE", "1000000000")
+os.environ.setdefault("AZURE_AI_SEARCH_REQUESTS_PER_MINUTE", "1000000")
+
+from backend.interfaces.azure_ai_embeddings import AsyncAzureOpenAI  # NoQA
+from backend.interfaces.azure_ai_search import AzureSearchClient  # NoQA
+from workers import process_tickets_worker as worker  # NoQA
+
+# Per-batch progress logging would drown the report.
+logging.getLogger().setLevel(logging.WARNING)
+
+WORDS = ("printer network outage vpn password reset mailbox license laptop server backup restore "
+         "firewall router switch teams outlook sharepoint onedrive update driver monitor").split()
+
+
+def generate_csv_files(directory: str, tickets: int, records_per_ticket: int, discussion_words: int, files: int):
+    """Write synthetic CSV exports in the layout of the real ticketing system export."""
+    rng = random.Random(42)
+    header = ["TicketNbr", "Summary", "Status_Description", "Status", "Company_Name", "Date_Entered",
+              "Textbox112", "Type", "ServiceLocation", "Priority", "Source", "Team"]
+    paths = []
+    for file_index in range(files):
+        path = os.path.join(directory, f"tickets_{file_index}.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for ticket in range(file_index, tickets, files):
+                summary = " ".join(rng.choices(WORDS, k=8))
+                for _ in range(records_per_ticket):
+                    writer.writerow([
+                        100000 + ticket, summary, "In Progress", "Open", f"Company {ticket % 50}",
+                        "03/19/2025 10:00:00", " ".join(rng.choices(WORDS, k=discussion_words)),
+                        "Incident", "Remote", f"Priority {ticket % 4}", "Email", f"Team {ticket % 5}"
+                    ])
+        paths.append(path)
+    return paths
+
+
+class FakeEmbeddingServer:
+    """In-process stand-in for POST /v1/embeddings."""
+
+    def __init__(self, latency: float, error_rate: float, dimensions: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.vector = [0.01] * dimensions
+        # The client asks for base64-encoded float32 vectors, like the real API returns.
+        self.vector_base64 = base64.b64encode(array("f", self.vector).tobytes()).decode("ascii")
+        self.requests = 0
+        self.errors = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return httpx.Response(429, headers={"retry-after-ms": "10"}, json={"error": {"message": "Rate limit reached"}})
+        body = json.loads(request.content)
+        inputs = body["input"]
+        vector = self.vector_base64 if body.get("encoding_format") == "base64" else self.vector
+        return httpx.Response(200, headers={"x-ratelimit-remaining-requests": "10000"}, json={
+            "object": "list",
+            "model": "fake-embedding",
+            "data": [{"object": "embedding", "index": index, "embedding": vector} for index in range(len(inputs))],
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)}
+        })
+
+
+class FakeSearchServer:
+    """In-process stand-in for POST /indexes/{index}/docs/index, failing individual documents at random."""
+
+    def __init__(self, latency: float, error_rate: float):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.documents = 0
+        self.errors = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        statuses = []
+        for document in json.loads(request.content)["value"]:
+            self.documents += 1
+            ok = random.random() >= self.error_rate
+            if not ok:
+                self.errors += 1
+            statuses.append({"key": document["id"], "status": ok, "statusCode": 200 if ok else 503,
+                             "errorMessage": None if ok else "Service unavailable"})
+        failed = any(not status["status"] for status in statuses)
+        return httpx.Response(207 if failed else 200, json={"value": statuses})
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its (parsing) children, in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(own, children) / scale
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the ticket ingestion worker against local stand-ins.")
+    parser.add_argument("--tickets", type=int, default=5000)
+    parser.add_argument("--records-per-ticket", type=int, default=3)
+    parser.add_argument("--discussion-words", type=int, default=60, help="Words per discussion record")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to parse CSV files")
+    parser.add_argument("--chunk-size", type=int, default=worker.config.INGEST_CSV_CHUNK_SIZE)
+    parser.add_argument("--embed-concurrency", type=int, default=worker.config.INGEST_EMBED_CONCURRENCY)
+    parser.add_argument("--upload-concurrency", type=int, default=worker.config.INGEST_UPLOAD_CONCURRENCY)
+    parser.add_argument("--embed-latency-ms", type=float, default=100)
+    parser.add_argument("--embed-error-rate", type=float, default=0.0)
+    parser.add_argument("--index-latency-ms", type=float, default=50)
+    parser.add_argument("--index-error-rate", type=float, default=0.0)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    embedding_server = FakeEmbeddingServer(args.embed_latency_ms / 1000, args.embed_error_rate, args.dimensions)
+    search_server = FakeSearchServer(args.index_latency_ms / 1000, args.index_error_rate)
+
+    worker.openai_client = AsyncAzureOpenAI(
+        endpoint="http://fake-openai/v1",
+        api_key="benchmark",
+        provider="openai",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(embedding_server.handle))
+    )
+    worker.azure_client = AzureSearchClient(
+        service_url="http://fake-search",
+        index_name=worker.INDEX_NAME,
+        api_key="benchmark",
+        vector_field="vector",
+        transport=httpx.MockTransport(search_server.handle)
+    )
+
+    csv_dir = os.path.join(BENCH_DIR, "csv")
+    os.makedirs(csv_dir)
+    csv_files = generate_csv_files(csv_dir, args.tickets, args.records_per_ticket, args.discussion_words, args.files)
+
+    started = time.monotonic()
+    tickets_df = worker.load_tickets(csv_files, workers=args.workers, chunksize=args.chunk_size)
+    parse_seconds = time.monotonic() - started
+
+    manifest = worker.IngestManifest()
+    pipeline = worker.IngestionPipeline(
+        embed_concurrency=args.embed_concurrency,
+        upload_concurrency=args.upload_concurrency,
+        report_interval=3600,
+        manifest=manifest
+    )
+    pipeline_started = time.monotonic()
+    try:
+        stats = asyncio.run(pipeline.run([tickets_df]))
+    finally:
+        manifest.close()
+    pipeline_seconds = time.monotonic() - pipeline_started
+    total_seconds = time.monotonic() - started
+
+    results = {
+        "tickets": len(tickets_df),
+        "tickets_per_second": len(tickets_df) / total_seconds,
+        "total_seconds": total_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {
+            "parse": {"seconds": parse_seconds, "tickets_per_second": len(tickets_df) / parse_seconds},
+            **{
+                name: {
+                    "busy_seconds": stage.busy_seconds,
+                    "tickets_per_second": stage.processed / pipeline_seconds,
+                    "failed": stage.failed
+                }
+                for name, stage in stats.items()
+            }
+        },
+        "embedding_requests": embedding_server.requests,
+        "embedding_errors": embedding_server.errors,
+        "index_requests": search_server.requests,
+        "indexed_documents": search_server.documents,
+        "index_errors": search_server.errors,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{results['tickets']} tickets in {total_seconds:.2f}s: {results['tickets_per_second']:.1f} tickets/s, "
+          f"peak RSS {results['peak_rss_mb']:.0f} MB")
+    for name, stage in results["stages"].items():
+        seconds = stage.get("seconds", stage.get("busy_seconds"))
+        print(f"  {name:<7} {stage['tickets_per_second']:>10.1f} tickets/s  {seconds:>8.2f}s")
+    print(f"  embedding requests: {embedding_server.requests} ({embedding_server.errors} errors), "
+          f"index requests: {search_server.requests} for {search_server.documents} documents ({search_server.errors} errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,12 @@
+import asyncio
 import os
 import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend import config  # NoQA
-from backend.interfaces.azure_ai_search import AzureSearchClient  # NoQA
+from backend.interfaces.azure_ai_search import get_search_client  # NoQA
 
-search_client = AzureSearchClient(
-    service_url=config.AZURE_AI_SEARCH_SERVICE,
-    index_name="ticket_index",
-    api_key=config.AZURE_AI_SEARCH_API_KEY,
-    api_version=config.AZURE_AI_SEARCH_API_VERSION,
-    vector_field="vector"
-)
+search_client = get_search_client()
 
 # Upload document with vector
 # embedding = [0.5] * 1536  # A dummy 1536-dimensional vector
@@ -31,6 +25,6 @@ search_client = AzureSearchClient(
 
 
 text_query = "Do you have a different solution, or did someo"
-results = search_client.fulltext_search(text_query=text_query, top_k=10)
-for doc in results:
+results = asyncio.run(search_client.fulltext_search(text_query=text_query, top_k=10))
+for doc in results.get("value", []):
     print(doc["id"], doc.get("ticket_id"), doc.get("title"), doc.get("@search.score"))
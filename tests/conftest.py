@@ -0,0 +1,23 @@
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+load_dotenv(ROOT_DIR / ".env.devel")
+
+# Keep the SQLite files written while importing the app and the worker out of data/.
+RUNTIME_DIR = tempfile.mkdtemp(prefix="cod8-tests-")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(RUNTIME_DIR, "embedding_cache.sqlite3")
+os.environ["INGEST_MANIFEST_PATH"] = os.path.join(RUNTIME_DIR, "ingest_manifest.sqlite3")
+os.environ["SEARCH_INDEX_GENERATION_PATH"] = os.path.join(RUNTIME_DIR, "index_generation")
+os.environ["TICKET_STORE_PATH"] = os.path.join(RUNTIME_DIR, "tickets.sqlite3")
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(RUNTIME_DIR, ignore_errors=True)
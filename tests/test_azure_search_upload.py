@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import httpx
+
+from backend.interfaces.azure_ai_search import AzureSearchClient
+
+
+class FakeIndex:
+    def __init__(self, fail_once=()):
+        self.fail_once = set(fail_once)
+        self.requests = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        statuses = []
+        for document in json.loads(request.content)["value"]:
+            ok = document["id"] not in self.fail_once
+            self.fail_once.discard(document["id"])
+            statuses.append({"key": document["id"], "status": ok, "statusCode": 200 if ok else 503})
+        return httpx.Response(200, json={"value": statuses})
+
+
+def make_client(index: FakeIndex) -> AzureSearchClient:
+    return AzureSearchClient(service_url="http://search", index_name="tickets", api_key="key",
+                             vector_field="vector", transport=httpx.MockTransport(index.handle))
+
+
+def make_documents(count: int):
+    return [{"id": str(i), "title": f"Ticket {i} ✓", "vector": [0.5] * 8} for i in range(count)]
+
+
+def test_batches_are_packed_by_payload_bytes():
+    index = FakeIndex()
+    client = make_client(index)
+    documents = make_documents(50)
+    max_payload_bytes = 1000
+
+    errors = asyncio.run(client.upload_documents(documents, max_payload_bytes=max_payload_bytes))
+
+    assert errors == {}
+    assert len(index.requests) > 1
+    uploaded = []
+    for request in index.requests:
+        assert request.headers["content-type"] == "application/json"
+        assert len(request.content) <= max_payload_bytes
+        uploaded.extend(json.loads(request.content)["value"])
+    assert [document["id"] for document in uploaded] == [document["id"] for document in documents]
+    assert uploaded[0] == {**documents[0], "@search.action": "upload"}
+
+
+def test_batches_respect_document_count_and_delete_sends_keys_only():
+    index = FakeIndex()
+    client = make_client(index)
+
+    asyncio.run(client.upload_documents(make_documents(25), action="delete", batch_size=10))
+
+    bodies = [json.loads(request.content)["value"] for request in index.requests]
+    assert [len(body) for body in bodies] == [10, 10, 5]
+    assert bodies[0][0] == {"id": "0", "@search.action": "delete"}
+
+
+def test_transient_failures_are_resent():
+    index = FakeIndex(fail_once={"3", "7"})
+    client = make_client(index)
+
+    errors = asyncio.run(client.upload_documents(make_documents(10)))
+
+    assert errors == {}
+    assert [document["id"] for document in json.loads(index.requests[-1].content)["value"]] == ["3", "7"]
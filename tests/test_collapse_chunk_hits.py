@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import httpx
+
+from backend.interfaces.azure_ai_search import (CHUNK_OVERSAMPLE,
+                                                AzureSearchClient)
+
+
+def make_client() -> AzureSearchClient:
+    return AzureSearchClient(service_url="http://search", index_name="tickets", api_key="key", vector_field="vector")
+
+
+def ticket_hit(ticket_id: str, score: float) -> dict:
+    return {"@search.score": score, "id": ticket_id, "ticket_id": ticket_id, "title": f"Ticket {ticket_id}",
+            "discussion": f"Full discussion of {ticket_id}", "doc_type": "ticket", "parent_id": None,
+            "chunk_index": None, "vector": [1.0, 0.0]}
+
+
+def chunk_hit(ticket_id: str, index: int, score: float) -> dict:
+    return {"@search.score": score, "id": f"{ticket_id}_chunk_{index}", "ticket_id": ticket_id,
+            "title": f"Ticket {ticket_id}", "discussion": f"Chunk {index} of {ticket_id}", "doc_type": "chunk",
+            "parent_id": ticket_id, "chunk_index": index, "vector": [0.0, 1.0]}
+
+
+def test_chunk_outranking_its_parent_collapses_to_a_clean_ticket_entry():
+    results = {"value": [chunk_hit("1", 2, 0.9), chunk_hit("1", 0, 0.8), ticket_hit("2", 0.7), ticket_hit("1", 0.5)]}
+
+    hits = make_client().collapse_chunk_hits(results, top_k=5)["value"]
+
+    assert [hit["id"] for hit in hits] == ["1", "2"]
+    ticket = hits[0]
+    assert ticket["@search.score"] == 0.9
+    assert ticket["doc_type"] == "ticket"
+    assert ticket["chunk_index"] is None
+    # The parent's own fields replace anything carried over from the chunk.
+    assert ticket["discussion"] == "Full discussion of 1"
+    assert ticket["vector"] == [1.0, 0.0]
+    assert ticket["matched_chunks"] == [
+        {"chunk_index": 2, "@search.score": 0.9, "text": "Chunk 2 of 1"},
+        {"chunk_index": 0, "@search.score": 0.8, "text": "Chunk 0 of 1"}
+    ]
+
+
+def test_chunk_without_its_parent_in_results_exposes_chunk_text_only_as_matched_chunk():
+    hits = make_client().collapse_chunk_hits({"value": [chunk_hit("1", 3, 0.9)]}, top_k=5)["value"]
+
+    assert hits == [{
+        "@search.score": 0.9, "id": "1", "ticket_id": "1", "title": "Ticket 1", "doc_type": "ticket",
+        "matched_chunks": [{"chunk_index": 3, "@search.score": 0.9, "text": "Chunk 3 of 1"}]
+    }]
+
+
+def test_collapse_keeps_top_k_tickets():
+    results = {"value": [ticket_hit("1", 0.9), chunk_hit("2", 0, 0.8), ticket_hit("3", 0.7), chunk_hit("1", 0, 0.6)]}
+
+    hits = make_client().collapse_chunk_hits(results, top_k=2)["value"]
+
+    assert [hit["id"] for hit in hits] == ["1", "2"]
+    assert hits[0]["discussion"] == "Full discussion of 1"
+    assert len(hits[0]["matched_chunks"]) == 1
+
+
+class FakeSearchIndex:
+    """Ranks one ticket's many chunks above every other ticket, like a keyword match on a shared field."""
+
+    def __init__(self, chunk_count: int, ticket_count: int):
+        self.tickets = {str(i): ticket_hit(str(i), 0.0) for i in range(ticket_count)}
+        # Ticket 0 itself does not match, only its chunks do.
+        ranked = [chunk_hit("0", index, 0.0) for index in range(chunk_count)] + list(self.tickets.values())[1:]
+        for rank, hit in enumerate(ranked):
+            hit["@search.score"] = 1.0 - rank / 1000
+        # Chunks only carry the filter fields of their parent.
+        self.ranked = [{k: v for k, v in hit.items() if k not in ("title",)} if hit["doc_type"] == "chunk" else hit
+                       for hit in ranked]
+        self.requests = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append(body)
+        if body.get("filter", "").startswith("search.in("):
+            keys = body["filter"].split("'")[1].split(",")
+            return httpx.Response(200, json={"value": [self.tickets[key] for key in keys]})
+        skip = body.get("skip", 0)
+        return httpx.Response(200, json={"value": self.ranked[skip:skip + body["top"]]})
+
+
+def test_ticket_with_more_chunks_than_the_oversampled_page_does_not_crowd_out_other_tickets():
+    top_k = 3
+    index = FakeSearchIndex(chunk_count=top_k * CHUNK_OVERSAMPLE + 5, ticket_count=5)
+    client = AzureSearchClient(service_url="http://search", index_name="tickets", api_key="key",
+                               vector_field="vector", transport=httpx.MockTransport(index.handle))
+
+    results = asyncio.run(client.hybrid_search(text_query="printer", embedding=[0.1, 0.2], top_k=top_k, cache=False))
+
+    hits = results["value"]
+    assert [hit["id"] for hit in hits] == ["0", "1", "2"]
+    # The ticket that only matched through its chunks gets its own fields from the parent document.
+    assert hits[0]["title"] == "Ticket 0"
+    assert hits[0]["doc_type"] == "ticket"
+    assert hits[0]["discussion"] == "Full discussion of 0"
+    assert len(hits[0]["matched_chunks"]) == top_k * CHUNK_OVERSAMPLE + 5
+    second_page = index.requests[1]
+    assert second_page["skip"] == top_k * CHUNK_OVERSAMPLE
+    assert second_page["vectorQueries"][0]["k"] == 2 * top_k * CHUNK_OVERSAMPLE
+    assert index.requests[-1]["filter"] == "search.in(id, '0', ',')"
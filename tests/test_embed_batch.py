@@ -0,0 +1,72 @@
+import asyncio
+
+from backend.helpers.embedding_service import EmbeddingBatcher
+from backend.helpers.text_chunking import count_tokens
+from backend.interfaces.azure_ai_embeddings import (AzureOpenAIError,
+                                                    pack_embedding_batches)
+from workers import process_tickets_worker as worker
+
+
+class FakeEmbeddingClient:
+    def __init__(self, bad_text: str = None, status_code: int = None):
+        self.bad_text = bad_text
+        self.status_code = status_code
+        self.requests = 0
+
+    async def create_embeddings(self, deployment, texts, tokens=None):
+        self.requests += 1
+        if self.status_code is not None and (self.bad_text is None or self.bad_text in texts):
+            raise AzureOpenAIError(f"status {self.status_code}", status_code=self.status_code)
+        return [[float(len(text))] for text in texts]
+
+
+def make_batch(count: int):
+    return [(str(i), f"text {i}") for i in range(count)]
+
+
+def test_input_error_is_isolated_by_splitting(monkeypatch):
+    client = FakeEmbeddingClient(bad_text="text 5", status_code=400)
+    monkeypatch.setattr(worker, "openai_client", client)
+
+    vectors = asyncio.run(worker.embed_batch(make_batch(16)))
+
+    assert set(vectors) == {str(i) for i in range(16)} - {"5"}
+    assert client.requests < 16
+
+
+def test_other_errors_fail_the_batch_once(monkeypatch):
+    for status_code in (401, 403, 404, 500):
+        client = FakeEmbeddingClient(status_code=status_code)
+        monkeypatch.setattr(worker, "openai_client", client)
+
+        assert asyncio.run(worker.embed_batch(make_batch(2048))) == {}
+        assert client.requests == 1
+
+
+def test_batches_are_packed_by_input_count_and_tokens():
+    items = make_batch(10)
+    tokens = count_tokens("text 0")
+
+    batches = pack_embedding_batches(items, max_inputs=4, max_tokens=3 * tokens, text=lambda item: item[1])
+
+    assert [len(batch) for batch, _ in batches] == [3, 3, 3, 1]
+    assert [item for batch, _ in batches for item in batch] == items
+    assert batches[0][1] == 3 * tokens
+
+    batches = pack_embedding_batches(items, max_inputs=4, max_tokens=1000, text=lambda item: item[1])
+
+    assert [len(batch) for batch, _ in batches] == [4, 4, 2]
+
+
+def test_batcher_fails_callers_whose_vector_is_missing():
+    async def send(texts, tokens):
+        return [None if text == "lost" else [1.0] for text in texts]
+
+    async def main():
+        batcher = EmbeddingBatcher(send, window=0.01, max_size=10, max_tokens=1000)
+        return await asyncio.gather(batcher.submit("kept"), batcher.submit("lost"), return_exceptions=True)
+
+    kept, lost = asyncio.run(main())
+
+    assert kept == [1.0]
+    assert isinstance(lost, AzureOpenAIError)
@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+
+from backend.helpers import import_jobs as jobs
+from workers import process_tickets_worker as worker
+
+CSV = "TicketNbr,Summary,Company_Name,Date_Entered,Discussion,Type,Priority,Source,Team\n" \
+      "1,Printer broken,ACME,2024-01-01 10:00,It jams,Incident,High,Email,Desk\n"
+
+
+def make_manager(tmp_path) -> jobs.ImportJobManager:
+    (tmp_path / "export").mkdir()
+    (tmp_path / "export" / "tickets.csv").write_text(CSV)
+    return jobs.ImportJobManager(csv_root=tmp_path)
+
+
+def test_pipeline_runs_on_its_own_thread_and_loop(tmp_path, monkeypatch):
+    seen = {}
+
+    async def run(self, frames):
+        seen["thread"] = threading.get_ident()
+        seen["loop"] = asyncio.get_running_loop()
+        seen["rows"] = sum(len(frame) for frame in frames)
+        return self.stats
+
+    monkeypatch.setattr(worker.IngestionPipeline, "run", run)
+    manager = make_manager(tmp_path)
+
+    async def main():
+        job = manager.submit("export")
+        await job.task
+        return job, asyncio.get_running_loop()
+
+    job, api_loop = asyncio.run(main())
+
+    assert job.state == jobs.COMPLETED, job.error
+    assert seen["rows"] == 1
+    assert seen["thread"] != threading.get_ident()
+    assert seen["loop"] is not api_loop
+
+
+def test_shutdown_cancels_running_jobs(tmp_path, monkeypatch):
+    started = threading.Event()
+    stopped = threading.Event()
+
+    async def run(self, frames):
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        finally:
+            stopped.set()
+
+    monkeypatch.setattr(worker.IngestionPipeline, "run", run)
+    manager = make_manager(tmp_path)
+
+    async def main():
+        job = manager.submit("export")
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(manager.shutdown(), 10)
+        return job
+
+    job = asyncio.run(main())
+
+    assert job.state == jobs.CANCELLED
+    # The job is only reported cancelled once the pipeline itself has stopped.
+    assert stopped.is_set()
+
+
+def parse_forever(connection, csv_files, workers, chunksize, spill_dir):
+    time.sleep(60)
+
+
+def test_cancel_terminates_the_parsing_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "parse_csv_files", parse_forever)
+    manager = make_manager(tmp_path)
+
+    async def main():
+        job = manager.submit("export")
+        while not multiprocessing.active_children():
+            await asyncio.sleep(0.01)
+        manager.cancel(job.id)
+        await asyncio.wait_for(asyncio.gather(job.task, return_exceptions=True), 10)
+        return job
+
+    job = asyncio.run(main())
+
+    assert job.state == jobs.CANCELLED
+    assert multiprocessing.active_children() == []
@@ -0,0 +1,78 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from workers import process_tickets_worker as worker
+
+
+def make_tickets(count: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "ticket_id": [str(i) for i in range(count)],
+        "id": [str(i) for i in range(count)],
+        "title": [f"Ticket {i}" for i in range(count)],
+        "discussion": [None] * count
+    })
+
+
+async def fake_vectorize(batch: pd.DataFrame):
+    batch = batch.copy()
+    batch["vector"] = [[0.1, 0.2]] * len(batch)
+    return batch, pd.DataFrame()
+
+
+def run_pipeline(frames, timeout: float = 5.0, **kwargs):
+    pipeline = worker.IngestionPipeline(batch_size=10, queue_size=1, **kwargs)
+    return asyncio.run(asyncio.wait_for(pipeline.run(frames), timeout))
+
+
+def test_pipeline_processes_every_batch(monkeypatch):
+    uploaded = []
+
+    async def upload_tickets(tickets_df):
+        uploaded.extend(tickets_df["id"])
+        return {}
+
+    monkeypatch.setattr(worker.IngestionPipeline, "_vectorize", staticmethod(fake_vectorize))
+    monkeypatch.setattr(worker, "upload_tickets", upload_tickets)
+
+    stats = run_pipeline([make_tickets(95)], embed_concurrency=2, upload_concurrency=2)
+
+    assert sorted(uploaded, key=int) == [str(i) for i in range(95)]
+    assert stats["upload"].processed == 95
+
+
+def test_pipeline_fails_when_upload_stage_raises(monkeypatch):
+    async def upload_tickets(tickets_df):
+        raise RuntimeError("upload exploded")
+
+    monkeypatch.setattr(worker.IngestionPipeline, "_vectorize", staticmethod(fake_vectorize))
+    monkeypatch.setattr(worker, "upload_tickets", upload_tickets)
+
+    # With every uploader dead the embedders block on the full upload queue; run() must still return.
+    with pytest.raises(RuntimeError, match="upload exploded"):
+        run_pipeline([make_tickets(200)], embed_concurrency=2, upload_concurrency=2)
+
+
+def test_pipeline_fails_when_embed_stage_raises(monkeypatch):
+    async def vectorize(batch):
+        raise ValueError("embedding exploded")
+
+    monkeypatch.setattr(worker.IngestionPipeline, "_vectorize", staticmethod(vectorize))
+
+    with pytest.raises(ValueError, match="embedding exploded"):
+        run_pipeline([make_tickets(200)], embed_concurrency=1, upload_concurrency=1)
+
+
+def test_chunks_carry_only_the_parent_filter_fields():
+    tickets = make_tickets(1).assign(company_name="ACME", priority="High", team="Desk", type="Incident",
+                                     source="Email", date_entered="2024-01-01T10:00:00Z",
+                                     discussion=" ".join(f"word{i}" for i in range(2000)))
+
+    chunks = worker.build_chunks(tickets, max_tokens=100, overlap=10)
+
+    assert len(chunks) > 1
+    assert set(chunks.columns) == {"id", "ticket_id", "company_name", "date_entered", "priority", "team",
+                                   "parent_id", "doc_type", "chunk_index", "discussion", "vector"}
+    assert (chunks["company_name"] == "ACME").all()
+    assert (chunks["parent_id"] == "0").all()
@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from workers.process_tickets_worker import join_discussions
+
+
+def expected_discussions(df: pd.DataFrame) -> pd.Series:
+    records = df[["ticket_id", "discussion"]].dropna()
+    return records.groupby("ticket_id", sort=False)["discussion"].agg(lambda x: " ".join(x.dropna()))
+
+
+def assert_matches_groupby(df: pd.DataFrame):
+    result = join_discussions(df)
+    expected = expected_discussions(df)
+    pdt.assert_series_equal(result.sort_index(), expected.sort_index(), check_names=False, check_index_type=False)
+
+
+def test_matches_groupby_join_with_interleaved_records_and_nan():
+    df = pd.DataFrame({
+        "ticket_id": ["1", "2", "1", "3", "2", "1", "4", "3"],
+        "discussion": ["a", "b", np.nan, None, "", "c d", np.nan, "e"]
+    })
+    assert_matches_groupby(df)
+    assert join_discussions(df)["1"] == "a c d"
+    # Tickets with only missing discussions are left out, like with dropna().
+    assert "4" not in join_discussions(df).index
+
+
+def test_matches_groupby_join_for_random_records():
+    rng = np.random.default_rng(0)
+    count = 5000
+    discussions = pd.Series([f"record {i} " * int(rng.integers(0, 5)) for i in range(count)], dtype=object)
+    discussions[rng.random(count) < 0.2] = np.nan
+    df = pd.DataFrame({"ticket_id": rng.integers(0, 300, count).astype(str), "discussion": discussions})
+    assert_matches_groupby(df)
+
+
+def test_large_single_group_is_linear():
+    count = 50000
+    df = pd.DataFrame({
+        "ticket_id": ["1"] * count,
+        "discussion": [np.nan if i % 7 == 0 else f"message {i}" for i in range(count)]
+    })
+    started = time.perf_counter()
+    result = join_discussions(df)
+    elapsed = time.perf_counter() - started
+
+    assert_matches_groupby(df)
+    assert len(result) == 1
+    assert elapsed < 1.0
+
+
+def test_empty_frame():
+    df = pd.DataFrame({"ticket_id": ["1"], "discussion": [np.nan]})
+    assert join_discussions(df).empty
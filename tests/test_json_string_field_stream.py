@@ -0,0 +1,73 @@
+import json
+import random
+
+import pytest
+
+from backend.helpers.streaming import JsonStringFieldStream
+
+DOCUMENTS = [
+    '{"answer": "plain text"}',
+    '{"answer":"escapes: \\" \\\\ \\/ \\b \\f \\n \\r \\t done"}',
+    '{"answer": "unicode \\u00e9\\u4e2d and a pair \\ud83d\\ude00 and raw 😀 é"}',
+    '{"answer": "lone \\ud83d surrogate \\ude00 and \\ud83d\\u0041"}',
+    '{"x": "\\"answer\\": \\"fake", "answer": "real"}',
+    '{"note": "the key \\"answer\\" appears here", "answer": "real"}',
+    '{"nested": {"answer": "inner"}, "list": ["answer", {"answer": "deep"}], "answer": "outer"}',
+    '{"answer_id": "no", "Answer": "no", "answer": "yes"}',
+    '{"next_step": "reply", "answer"  :  "spaced key and colon", "tickets": [1, 2]}',
+    '```json\n{\n  "answer": "after a code fence\\nwith lines",\n  "next_step": "done"\n}\n```',
+    '{"count": 3, "flag": true, "empty": null, "answer": ""}',
+    '{"answer": "ends with escaped backslash \\\\"}',
+]
+
+
+def feed_in_pieces(document: str, rng: random.Random) -> str:
+    stream = JsonStringFieldStream("answer")
+    output = []
+    position = 0
+    while position < len(document):
+        size = rng.randint(1, 8)
+        output.append(stream.feed(document[position:position + size]))
+        position += size
+    return "".join(output)
+
+
+def expected_answer(document: str) -> str:
+    start, end = document.index("{"), document.rindex("}")
+    return json.loads(document[start:end + 1])["answer"]
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_randomly_split_chunks_decode_like_json_loads(document):
+    rng = random.Random(document)
+    expected = expected_answer(document)
+    for _ in range(200):
+        assert feed_in_pieces(document, rng) == expected
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_one_character_at_a_time(document):
+    stream = JsonStringFieldStream("answer")
+    assert "".join(stream.feed(char) for char in document) == expected_answer(document)
+
+
+def test_random_documents_round_trip():
+    rng = random.Random(0)
+    alphabet = ['a', ' ', '"', '\\', '\n', '\t', '/', 'é', '中', '😀', '\ud83d', '\x01', '{', '}', ':', ',']
+    for _ in range(300):
+        answer = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        decoy = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 10)))
+        document = json.dumps({"x": f'"answer": "{decoy}', "nested": {"answer": decoy}, "answer": answer},
+                              ensure_ascii=rng.random() < 0.5)
+        assert feed_in_pieces(document, rng) == answer
+
+
+def test_output_stops_at_the_end_of_the_field():
+    stream = JsonStringFieldStream("answer")
+    assert stream.feed('{"answer": "done", "more": "text"') == "done"
+    assert stream.feed(', "answer": "again"}') == ""
+
+
+def test_non_string_field_is_not_streamed():
+    stream = JsonStringFieldStream("answer")
+    assert stream.feed('{"answer": null, "other": "answer"}') == ""
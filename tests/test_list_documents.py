@@ -0,0 +1,51 @@
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.api_v1.endpoints import search_endpoints
+from backend.interfaces.azure_ai_search import AzureSearchClient
+
+DOCUMENTS = [{"id": f"{i:03d}", "title": f"Ticket {i}"} for i in range(25)]
+
+
+def handle(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    documents = DOCUMENTS
+    if body.get("filter"):
+        last_key = body["filter"].split("'")[1]
+        documents = [document for document in documents if document["id"] > last_key]
+    start = body.get("skip", 0)
+    return httpx.Response(200, json={"value": documents[start:start + body["top"]]})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    search_client = AzureSearchClient(service_url="http://search", index_name="tickets", api_key="key",
+                                      vector_field="vector", transport=httpx.MockTransport(handle))
+    monkeypatch.setattr(search_endpoints, "get_search_client", lambda: search_client)
+    app = FastAPI()
+    app.include_router(search_endpoints.router)
+    return TestClient(app)
+
+
+def list_ids(client: TestClient, stream: bool, **params):
+    response = client.get("/list_documents", params={"stream": stream, "batch_size": 10, **params})
+    assert response.status_code == 200
+    if stream:
+        return [json.loads(line)["id"] for line in response.text.splitlines()]
+    return [document["id"] for document in response.json()]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_limit_has_the_same_meaning_with_and_without_streaming(client, stream):
+    assert list_ids(client, stream) == [f"{i:03d}" for i in range(10)]
+    assert list_ids(client, stream, limit=3, offset=5) == ["005", "006", "007"]
+    # 0 lists everything in both modes.
+    assert list_ids(client, stream, limit=0) == [document["id"] for document in DOCUMENTS]
+
+
+def test_negative_limit_is_rejected(client):
+    assert client.get("/list_documents", params={"limit": -1}).status_code == 422
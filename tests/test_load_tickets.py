@@ -0,0 +1,35 @@
+import pandas as pd
+
+from workers import process_tickets_worker as worker
+
+HEADER = "TicketNbr,Summary,Company_Name,Date_Entered,Discussion,Type,Priority,Source,Team\n"
+
+
+def write_csv(path, rows):
+    path.write_text(HEADER + "".join(f"{ticket},Ticket {ticket},ACME,2024-01-01 10:00,{text},Incident,High,Email,Desk\n"
+                                     for ticket, text in rows))
+    return str(path)
+
+
+def test_tickets_spanning_chunks_and_files_are_combined_in_order(tmp_path):
+    first = write_csv(tmp_path / "a.csv", [(ticket % 7, f"a{index}") for index, ticket in enumerate(range(50))])
+    second = write_csv(tmp_path / "b.csv", [(ticket % 7, f"b{index}") for index, ticket in enumerate(range(20))])
+
+    frames = list(worker.iter_tickets([first, second], chunksize=4, spill_dir=str(tmp_path / "spill"), partitions=3))
+
+    tickets = pd.concat(frames, ignore_index=True)
+    assert 1 < len(frames) <= 3
+    assert sorted(tickets["ticket_id"]) == [str(ticket) for ticket in range(7)]
+    discussions = dict(zip(tickets["ticket_id"], tickets["discussion"]))
+    assert discussions["3"] == " ".join([f"a{index}" for index in range(3, 50, 7)] + [f"b{index}" for index in range(3, 20, 7)])
+
+
+def test_parallel_parsing_matches_sequential_parsing(tmp_path):
+    files = [write_csv(tmp_path / f"{name}.csv", [(ticket % 11, f"{name}{ticket}") for ticket in range(40)])
+             for name in "abc"]
+
+    sequential = worker.load_tickets(files, chunksize=7)
+    parallel = worker.load_tickets(files, workers=2, chunksize=7)
+
+    pd.testing.assert_frame_equal(sequential, parallel)
+    assert list(sequential["ticket_id"]) == sorted(sequential["ticket_id"], reverse=True)
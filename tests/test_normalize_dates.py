@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from workers.process_tickets_worker import normalize_dates
+
+
+def normalize(values, timezone="UTC"):
+    return normalize_dates(pd.Series(values, dtype=object), timezone=timezone).tolist()
+
+
+def test_naive_timestamps_are_taken_in_the_configured_timezone():
+    assert normalize(["2024-01-15 10:00:00", "2024-07-15 10:00"], timezone="Europe/Prague") == [
+        "2024-01-15T09:00:00Z", "2024-07-15T08:00:00Z"
+    ]
+    assert normalize(["01/15/2024 10:00 AM", "2024-01-15T10:00:00"]) == ["2024-01-15T10:00:00Z", "2024-01-15T10:00:00Z"]
+
+
+def test_aware_timestamps_keep_their_offset():
+    assert normalize(["2024-01-15T10:00:00Z", "2024-01-15 10:00:00-05:00", "2024-01-15T10:00:00+0530"],
+                     timezone="Europe/Prague") == ["2024-01-15T10:00:00Z", "2024-01-15T15:00:00Z", "2024-01-15T04:30:00Z"]
+
+
+def test_mixed_naive_and_aware_timestamps_are_all_kept():
+    assert normalize(["2024-01-15 10:00:00", "2024-01-15 10:00:00+02:00", np.nan, None], timezone="Europe/Prague") == [
+        "2024-01-15T09:00:00Z", "2024-01-15T08:00:00Z", np.nan, np.nan
+    ]
+
+
+def test_offsets_on_both_sides_of_a_dst_change():
+    result = normalize(["2024-03-31 01:30:00+01:00", "2024-03-31 03:30:00+02:00", "2024-10-27 02:30:00+02:00",
+                        "2024-10-27 02:30:00+01:00"])
+    assert result == ["2024-03-31T00:30:00Z", "2024-03-31T01:30:00Z", "2024-10-27T00:30:00Z", "2024-10-27T01:30:00Z"]
+
+
+def test_naive_timestamps_around_a_dst_change():
+    result = normalize(["2024-03-31 01:30:00", "2024-03-31 02:30:00", "2024-03-31 03:30:00", "2024-10-27 02:30:00"],
+                       timezone="Europe/Prague")
+    # The skipped hour is shifted forward; the repeated hour is ambiguous and left missing.
+    assert result == ["2024-03-31T00:30:00Z", "2024-03-31T01:00:00Z", "2024-03-31T01:30:00Z", np.nan]
+
+
+def test_unparseable_and_missing_values_become_missing():
+    assert normalize(["not a date", np.nan, "2024-01-15"]) == [np.nan, np.nan, "2024-01-15T00:00:00Z"]
+    assert normalize([np.nan, np.nan]) == [np.nan, np.nan]
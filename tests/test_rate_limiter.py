@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import httpx
+
+from backend.helpers.rate_limiter import (RateLimitScheduler,
+                                          background_priority)
+
+
+def make_scheduler() -> RateLimitScheduler:
+    return RateLimitScheduler("test", requests_per_minute=6000, tokens_per_minute=60_000, background_share=0.5)
+
+
+def test_large_background_reservation_does_not_delay_interactive_calls():
+    scheduler = make_scheduler()
+
+    with background_priority():
+        background_delay = scheduler._reserve(100_000)
+    interactive_delay = scheduler._reserve(10)
+
+    # The import batch waits for its half of the 1000 tokens/s limit, the interactive call only for its own tokens.
+    assert 180 < background_delay < 200
+    assert interactive_delay < 0.1
+
+
+def test_background_calls_wait_for_interactive_reservations():
+    scheduler = make_scheduler()
+
+    scheduler._reserve(10_000)
+    with background_priority():
+        # The shared bucket is 5000 tokens in debt at 1000 tokens/s.
+        assert 4.5 < scheduler._reserve(10) < 5.5
+
+
+def test_background_priority_is_inherited_by_tasks():
+    scheduler = make_scheduler()
+
+    async def main():
+        with background_priority():
+            await asyncio.gather(*(asyncio.create_task(scheduler.acquire(1000)) for _ in range(2)))
+
+    asyncio.run(main())
+
+    assert 500 <= scheduler.background_tokens.tokens < 600
+    assert scheduler.tokens.tokens > 0
+
+
+def test_retry_after_on_a_server_error_delays_the_retry():
+    scheduler = make_scheduler()
+    started = []
+
+    async def call():
+        started.append(time.monotonic())
+        if len(started) == 1:
+            request = httpx.Request("POST", "http://upstream")
+            response = httpx.Response(502, headers={"Retry-After": "0.3"}, request=request)
+            raise httpx.HTTPStatusError("bad gateway", request=request, response=response)
+        return "ok"
+
+    assert asyncio.run(scheduler.run(call)) == "ok"
+    assert started[1] - started[0] >= 0.3
+    # A server error is not a throttle, the sending rate is left alone.
+    assert scheduler.factor == 1.0
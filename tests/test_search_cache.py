@@ -0,0 +1,31 @@
+import sys
+import threading
+
+from backend.helpers.search_cache import SearchResultCache
+
+
+def test_concurrent_invalidation_keeps_the_cache_consistent(tmp_path):
+    # Switch threads as often as possible to make interleavings likely.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    cache = SearchResultCache(ttl=60, max_entries=50, max_bytes=10_000, marker_path=tmp_path / "generation")
+    stop = threading.Event()
+
+    def invalidate():
+        while not stop.is_set():
+            cache.invalidate()
+
+    invalidator = threading.Thread(target=invalidate)
+    invalidator.start()
+    try:
+        for i in range(100_000):
+            key = i % 200
+            if cache.get(key) is None:
+                cache.put(key, {"value": [key]}, cache.generation)
+    finally:
+        stop.set()
+        invalidator.join()
+        sys.setswitchinterval(switch_interval)
+
+    assert len(cache.entries) <= 50
+    assert cache.bytes == sum(size for _, size, _ in cache.entries.values())
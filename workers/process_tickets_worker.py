@@ -1,11 +1,24 @@
+import argparse
 import asyncio
+import base64
 import glob
+import hashlib
+import json
 import logging
+import math
 import os
+import pickle
+import re
+import sqlite3
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from openai import OpenAI
 
 # Add the parent directory to sys.path
 current_dir = os.path.dirname(__file__)
@@ -13,208 +26,744 @@ parent_dir = os.path.join(current_dir, '..')
 sys.path.append(os.path.abspath(parent_dir))
 
 from backend import config  # NoQA
-from backend.interfaces.azure_ai_search import AzureSearchClient  # NoQA
+from backend.helpers.embedding_cache import embedding_cache  # NoQA
+from backend.helpers.embedding_service import is_input_error  # NoQA
+from backend.helpers.text_chunking import chunk_text  # NoQA
+from backend.interfaces.azure_ai_embeddings import get_openai_client  # NoQA
+from backend.interfaces.azure_ai_embeddings import \
+    pack_embedding_batches  # NoQA
+from backend.interfaces.azure_ai_search import get_search_client  # NoQA
+from backend.interfaces.http_client import close_http_client  # NoQA
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 INDEX_NAME = "ticket_index"
 
-azure_client = AzureSearchClient(
-    service_url=config.AZURE_AI_SEARCH_SERVICE,
-    index_name=INDEX_NAME,
-    api_key=config.AZURE_AI_SEARCH_API_KEY,
-    api_version=config.AZURE_AI_SEARCH_API_VERSION,
-    vector_field="vector"
-)
-
-openai_client = OpenAI(api_key=config.CHATGPT_KEY)
-
-
-def process_ticket_csv(filename):
-    """
-    Reads a CSV file containing ticket data, generates a new sequential primary 'id',
-    and stores the original ticket id from 'TicketNbr' as 'ticket_id'.
-    Also adds a placeholder 'vector' field.
-    """
-    # Define the columns to extract.
-    # 'TicketNbr' is only used to capture the actual ticket id.
-    required_columns = [
-        "TicketNbr",
-        "Summary",
-        "Status_Description",
-        "Status",
-        "Company_Name",
-        "Date_Entered",
-        "Discussion",
-        "Type",
-        "ServiceLocation",
-        "Priority",
-        "Source",
-        "Team"
-    ]
-    df = pd.read_csv(filename, dtype={"TicketNbr": str})
-    df.rename(columns={"Textbox112": "Discussion"}, inplace=True)
+azure_client = get_search_client(INDEX_NAME)
+
+openai_client = get_openai_client()
+
+# Azure Search document keys may only contain letters, digits, underscore, dash and equal sign.
+DOCUMENT_KEY_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_\-=]*$")
+
+# CSV export columns that end up in the index. 'TicketNbr' is only used to capture the actual ticket id.
+CSV_COLUMNS = [
+    "TicketNbr",
+    "Summary",
+    "Company_Name",
+    "Date_Entered",
+    "Discussion",
+    "Type",
+    "Priority",
+    "Source",
+    "Team"
+]
+
+# Some exports name the discussion column after its report textbox.
+CSV_COLUMN_ALIASES = {"Textbox112": "Discussion"}
+
+CSV_COLUMN_RENAMES = {
+    "TicketNbr": "ticket_id",
+    "Summary": "title",
+    "Company_Name": "company_name",
+    "Date_Entered": "date_entered",
+    "Type": "type",
+    "Priority": "priority",
+    "Source": "source",
+    "Team": "team",
+    "Discussion": "discussion"
+}
+
+# Aggregated fields that make up a ticket's content hash.
+CONTENT_FIELDS = ["title", "company_name", "date_entered", "discussion", "type", "priority", "source", "team"]
+
+# Final column order as per the index schema.
+FINAL_COLUMNS = ["id", "ticket_id", "vector", *CONTENT_FIELDS]
+
+# Timestamps ending in a UTC offset or zone designator, e.g. '2024-03-31 01:30:00+01:00' or '...T10:00Z'.
+AWARE_TIMESTAMP_PATTERN = re.compile(r"\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:Z|[+-]\d{2}(?::?\d{2})?|UTC|GMT)$", re.IGNORECASE)
+
+# Parent fields copied onto discussion chunks: the ticket id and the fields searches filter on (see build_filter).
+CHUNK_PARENT_FIELDS = ["ticket_id", "company_name", "date_entered", "priority", "team"]
+
+# Fields aggregated as the first non-null value per ticket; 'discussion' is joined across records instead.
+FIRST_AGGREGATION_FIELDS = [field for field in CONTENT_FIELDS if field != "discussion"]
+
+
+def document_key(ticket_id: str) -> str:
+    """
+    Derives a stable Azure Search document key from the ticket id.
+    Ids that are not valid keys are encoded as URL-safe base64.
+    """
+    ticket_id = str(ticket_id)
+    if DOCUMENT_KEY_PATTERN.match(ticket_id):
+        return ticket_id
+    return "b64_" + base64.urlsafe_b64encode(ticket_id.encode("utf-8")).decode("ascii")
+
+
+def content_hash(ticket: dict) -> str:
+    """
+    Hashes the aggregated content fields of a ticket, treating missing values as null.
+    """
+    content = {field: (None if pd.isna(ticket.get(field)) else str(ticket.get(field))) for field in CONTENT_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """
+    Local SQLite manifest of ingested tickets, keyed by ticket_id. Stores the content hash,
+    embedding model and upload state of every ticket so reruns only embed and upload tickets
+    that are new or changed, and an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path=config.INGEST_MANIFEST_PATH, embedding_model: str = config.OPENAI_EMBEDDING_MODEL):
+        self.embedding_model = embedding_model
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS tickets (
+                ticket_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                embedding_model TEXT NOT NULL,
+                state TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(tickets)")}
+        if "chunk_count" not in columns:
+            self.connection.execute("ALTER TABLE tickets ADD COLUMN chunk_count INTEGER NOT NULL DEFAULT 0")
+        self.connection.commit()
+
+    def _select(self, query: str, ticket_ids: List[str], *params) -> list:
+        rows = []
+        # Stay well below SQLite's bound parameter limit.
+        for start in range(0, len(ticket_ids), 500):
+            chunk = ticket_ids[start:start + 500]
+            rows.extend(self.connection.execute(
+                query.format(placeholders=",".join("?" * len(chunk))), [*params, *chunk]
+            ).fetchall())
+        return rows
+
+    def pending(self, tickets_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the tickets whose content or embedding model changed, or that were never uploaded.
+        The returned frame carries a 'content_hash' column used by `record`.
+        """
+        tickets_df = tickets_df.copy()
+        tickets_df["content_hash"] = [content_hash(ticket) for ticket in tickets_df.to_dict(orient="records")]
+
+        ticket_ids = [str(ticket_id) for ticket_id in tickets_df["ticket_id"]]
+        uploaded = dict(self._select(
+            "SELECT ticket_id, content_hash FROM tickets WHERE state = 'uploaded' AND embedding_model = ? "
+            "AND ticket_id IN ({placeholders})",
+            ticket_ids, self.embedding_model
+        ))
+
+        is_current = [uploaded.get(ticket_id) == digest for ticket_id, digest in zip(ticket_ids, tickets_df["content_hash"])]
+        return tickets_df[[not current for current in is_current]]
+
+    def chunk_counts(self, ticket_ids: Iterable[str]) -> Dict[str, int]:
+        """Returns the number of chunk documents last indexed for each ticket."""
+        return dict(self._select(
+            "SELECT ticket_id, chunk_count FROM tickets WHERE ticket_id IN ({placeholders})",
+            [str(ticket_id) for ticket_id in ticket_ids]
+        ))
+
+    def record(self, tickets_df: pd.DataFrame, failed_ids: Iterable[str] = (), chunk_counts: Optional[Dict[str, int]] = None):
+        """
+        Records the upload state of a batch returned by `pending`. Tickets whose document key is
+        in `failed_ids` are marked as failed and picked up again on the next run.
+        """
+        failed_ids = set(failed_ids)
+        chunk_counts = chunk_counts or {}
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO tickets (ticket_id, content_hash, embedding_model, state, chunk_count, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (str(ticket_id), digest, self.embedding_model, "failed" if doc_id in failed_ids else "uploaded",
+                 chunk_counts.get(str(ticket_id), 0), now)
+                for ticket_id, doc_id, digest in zip(tickets_df["ticket_id"], tickets_df["id"], tickets_df["content_hash"])
+            ]
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def prepare_ticket_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Selects the indexed CSV columns from raw rows and renames them to the index schema.
+    Columns missing from the export are added as empty.
+    """
+    df = df.rename(columns=CSV_COLUMN_ALIASES).rename(columns=CSV_COLUMN_RENAMES)
+    return df.reindex(columns=["ticket_id", *CONTENT_FIELDS])
+
+
+def join_discussions(df: pd.DataFrame) -> pd.Series:
+    """
+    Joins the non-null discussion records of each ticket with spaces, in record order, indexed by
+    ticket_id. Equivalent to grouping with " ".join(x.dropna()), but sort-based: records are stably
+    sorted by ticket, joined into one string with a single " ".join, and every ticket's text is
+    sliced out of it by cumulative record lengths, so the cost stays linear in the total text.
+    """
+    records = df[["ticket_id", "discussion"]].dropna()
+    if records.empty:
+        return pd.Series(dtype=object)
+
+    codes, ticket_ids = pd.factorize(records["ticket_id"])
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    texts = records["discussion"].astype(str).to_numpy(dtype=object)[order]
+    joined = " ".join(texts)
+    # offsets[i] is where record i starts in `joined`; each record is followed by one separator.
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)) + 1, out=offsets[1:])
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(texts)]
+    discussions = [joined[start:end - 1] for start, end in zip(offsets[starts].tolist(), offsets[ends].tolist())]
+    return pd.Series(discussions, index=ticket_ids[codes[starts]], dtype=object)
+
+
+def aggregate_tickets(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Groups rows by ticket_id, accumulating the discussion from multiple records.
+    Works on prepared rows as well as on previously aggregated tickets.
+    Tickets without any discussion are left empty so folding aggregates adds no stray separators.
+    """
+    grouped = df.groupby("ticket_id", sort=False)[FIRST_AGGREGATION_FIELDS].first()
+    grouped["discussion"] = join_discussions(df).reindex(grouped.index)
+    return grouped.reset_index()[["ticket_id", *CONTENT_FIELDS]]
+
+
+def parse_timestamps(values: pd.Series, utc: bool = False) -> pd.Series:
+    """
+    Parses timestamp strings with one inferred format first (vectorized), then element-wise for
+    anything left over. Unparseable values become NaT.
+    """
+    parsed = pd.to_datetime(values, errors="coerce", utc=utc)
+    leftover = parsed.isna() & values.notna()
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(values[leftover], errors="coerce", utc=utc, format="mixed")
+    return parsed
+
+
+def normalize_dates(values: pd.Series, timezone: str = config.INGEST_DATE_TIMEZONE) -> pd.Series:
+    """
+    Converts export timestamps to ISO 8601 UTC strings for the Edm.DateTimeOffset 'date_entered'
+    field, so date range filters run in the index. Timestamps with a UTC offset are converted as
+    they are, naive ones are taken to be in `timezone`; values that cannot be parsed become missing.
+    """
+    text = values.astype("string").str.strip()
+    aware = text.str.contains(AWARE_TIMESTAMP_PATTERN, na=False)
+    naive = text.notna() & ~aware
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, UTC]")
+    if aware.any():
+        # Parsing to UTC handles different offsets, e.g. either side of a DST change, in one column.
+        parsed[aware] = parse_timestamps(text[aware], utc=True)
+    if naive.any():
+        local = parse_timestamps(text[naive]).dt.tz_localize(timezone, ambiguous="NaT", nonexistent="shift_forward")
+        parsed[naive] = local.dt.tz_convert("UTC")
+    return parsed.dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def finalize_tickets(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the primary 'id' (the document key, derived from the ticket id so it is stable across runs)
+    and a placeholder 'vector' field, normalizes 'date_entered' and orders the columns as per the
+    index schema.
+    """
+    df = df.sort_values(by="ticket_id", ascending=False, ignore_index=True)
+    df.insert(0, "id", df["ticket_id"].map(document_key))
+    df["date_entered"] = normalize_dates(df["date_entered"])
+    df["discussion"] = df["discussion"].fillna("")
+    df["vector"] = None
+    return df[FINAL_COLUMNS]
 
-    missing_columns = set(required_columns) - set(df.columns)
+
+class TicketSpill:
+    """
+    On-disk store of pre-aggregated tickets, hash-partitioned by ticket_id so that all records of a
+    ticket end up in the same partition file. Each CSV chunk is aggregated on its own and appended
+    to the partition files, so parsing only ever holds one chunk of the export in memory.
+    """
+
+    def __init__(self, directory: str, partitions: int):
+        self.directory = directory
+        self.partitions = partitions
+
+    def _path(self, partition: int) -> str:
+        return os.path.join(self.directory, f"{partition}.pkl")
+
+    def add(self, df: pd.DataFrame):
+        """Adds raw CSV rows."""
+        self.add_partial(aggregate_tickets(prepare_ticket_frame(df)))
+
+    def add_partial(self, partial: pd.DataFrame):
+        """Adds tickets already aggregated by `aggregate_tickets`, appending them to their partitions."""
+        if partial.empty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Deterministic across processes, unlike hash().
+        partitions = pd.util.hash_pandas_object(partial["ticket_id"], index=False).to_numpy() % self.partitions
+        for partition, tickets in partial.groupby(partitions, sort=False):
+            with open(self._path(partition), "ab") as file:
+                pickle.dump(tickets, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def add_csv(self, filename: str, chunksize: Optional[int] = None):
+        """Adds a CSV export, streaming it in chunks of `chunksize` rows when given."""
+        if chunksize:
+            for chunk in read_ticket_csv(filename, chunksize=chunksize):
+                self.add(chunk)
+        else:
+            self.add(read_ticket_csv(filename))
+
+    def read(self, partition: int) -> List[pd.DataFrame]:
+        """Returns the partials spilled to a partition, in the order they were added."""
+        partials = []
+        try:
+            with open(self._path(partition), "rb") as file:
+                while True:
+                    try:
+                        partials.append(pickle.load(file))
+                    except EOFError:
+                        break
+        except FileNotFoundError:
+            pass
+        return partials
+
+
+def read_ticket_csv(filename: str, chunksize: Optional[int] = None):
+    """
+    Reads only the indexed columns of a ticket CSV export, as strings. With `chunksize` the file is
+    streamed and an iterator of DataFrames is returned.
+    """
+    header = pd.read_csv(filename, nrows=0).columns
+    missing_columns = set(CSV_COLUMNS) - set(header.map(lambda column: CSV_COLUMN_ALIASES.get(column, column)))
     if missing_columns:
         logger.info(f"Warning: Missing columns in CSV: {missing_columns}")
 
-    # Keep only available columns from the required list.
-    df_subset = df[[col for col in required_columns if col in df.columns]].copy()
+    wanted = set(CSV_COLUMNS) | set(CSV_COLUMN_ALIASES)
+    return pd.read_csv(filename, usecols=lambda column: column in wanted, dtype=str, chunksize=chunksize)
+
+
+def process_ticket_csv(filename, chunksize: Optional[int] = None) -> pd.DataFrame:
+    """
+    Reads a CSV file containing ticket data, stores the original ticket id from 'TicketNbr'
+    as 'ticket_id' and derives a stable primary 'id' (the document key) from it.
+    Also adds a placeholder 'vector' field. With `chunksize` the file is streamed in chunks
+    of that many rows.
+    """
+    return load_tickets([filename], chunksize=chunksize)
+
 
-    # Capture the actual ticket id into a new column 'ticket_id' and drop the original.
-    if "TicketNbr" in df_subset.columns:
-        df_subset["ticket_id"] = df_subset["TicketNbr"]
-        df_subset.drop(columns=["TicketNbr"], inplace=True)
+def spill_ticket_csv(filename: str, spill: TicketSpill, chunksize: Optional[int] = None):
+    """
+    Parses a single CSV export into its spill. Used as the process pool task.
+    """
+    logger.info(f"Processing file: {filename}")
+    spill.add_csv(filename, chunksize=chunksize)
+
+
+def iter_tickets(csv_files: List[str], workers: int = 1, chunksize: Optional[int] = None,
+                 spill_dir: Optional[str] = None, partitions: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Parses the CSV exports, in a pool of `workers` processes when more than one, and yields the
+    finalized tickets one spill partition at a time. Every file is spilled to disk under `spill_dir`
+    (a temporary directory by default), then each partition is folded across all files, so tickets
+    spanning several chunks or files are combined while only one partition is held in memory.
+    Partials are folded in file order, so the result does not depend on which process finishes first.
+    By default there are as many partitions as needed for INGEST_SPILL_PARTITION_BYTES of CSV data each.
+    """
+    if partitions is None:
+        export_bytes = sum(os.path.getsize(file) for file in csv_files)
+        partitions = max(1, math.ceil(export_bytes / config.INGEST_SPILL_PARTITION_BYTES))
+    if spill_dir is None:
+        with tempfile.TemporaryDirectory(prefix="tickets-") as spill_dir:
+            yield from iter_tickets(csv_files, workers, chunksize, spill_dir, partitions)
+        return
+
+    spills = [TicketSpill(os.path.join(spill_dir, str(index)), partitions) for index in range(len(csv_files))]
+    if workers > 1 and len(csv_files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(spill_ticket_csv, csv_files, spills, repeat(chunksize)))
     else:
-        df_subset["ticket_id"] = ""
-
-    # Insert a new sequential primary id column as string (starting from 1)
-    df_subset.insert(0, "id", [str(i) for i in range(1, len(df_subset) + 1)])
-
-    # Add a placeholder for the vector.
-    df_subset["vector"] = None
-
-    # Rename the relevant columns to lowercase.
-    df_subset.rename(
-        columns={
-            "Company_Name": "company_name",
-            "Date_Entered": "date_entered",
-            "Type": "type",
-            "Priority": "priority",
-            "Source": "source",
-            "Team": "team",
-            "Discussion": "discussion"
-        },
-        inplace=True
-        )
+        for file, spill in zip(csv_files, spills):
+            spill_ticket_csv(file, spill, chunksize=chunksize)
+
+    for partition in range(partitions):
+        partials = [partial for spill in spills for partial in spill.read(partition)]
+        if partials:
+            yield finalize_tickets(aggregate_tickets(pd.concat(partials, ignore_index=True)))
 
-    # Rename the "Summary" column to "title".
-    df_subset.rename(columns={"Summary": "title"}, inplace=True)
-
-    # Define final column order as per the updated schema.
-    final_order = [
-        "id",
-        "ticket_id",
-        "vector",
-        "title",
-        "company_name",
-        "date_entered",
-        "discussion",
-        "type",
-        "priority",
-        "source",
-        "team"
-    ]
-    df_final = df_subset[[col for col in final_order if col in df_subset.columns]]
-
-    # Group rows by ticket_id to accumulate discussion from multiple records.
-    df_grouped = df_final.groupby("ticket_id", as_index=False).agg({
-        "title": "first",
-        "company_name": "first",
-        "date_entered": "first",
-        "discussion": lambda x: " ".join(x.dropna().astype(str)),
-        "type": "first",
-        "priority": "first",
-        "source": "first",
-        "team": "first",
-        "vector": "first"
-    })
-    df_grouped.sort_values(by="ticket_id", ascending=False, inplace=True)
-    # Recalculate sequential primary id for grouped records.
-    df_grouped.insert(0, "id", [str(i) for i in range(1, len(df_grouped) + 1)])
-    df_grouped = df_grouped[final_order]
-    return df_grouped
-
-
-def vectorize_ticket(ticket: pd.Series) -> pd.Series:
-    """
-    Vectorizes the ticket's title field using OpenAI embeddings and stores the result in 'vector'.
-    """
-    logger.info(f"Vectorizing ticket {ticket['id']} (actual ticket id: {ticket.get('ticket_id', 'N/A')})")
-    text_to_embed = ticket.get("title", "")
-    if not text_to_embed:
-        logger.info(f"No title for ticket {ticket['id']}. Skipping vectorization.")
-        return ticket
 
+def load_tickets(csv_files: List[str], workers: int = 1, chunksize: Optional[int] = None) -> pd.DataFrame:
+    """
+    Parses the CSV exports into a single DataFrame of tickets, see `iter_tickets`. This holds every
+    ticket in memory at once; the ingestion itself streams `iter_tickets` instead.
+    """
+    frames = list(iter_tickets(csv_files, workers=workers, chunksize=chunksize))
+    if not frames:
+        return finalize_tickets(aggregate_tickets(prepare_ticket_frame(pd.DataFrame())))
+    return pd.concat(frames, ignore_index=True).sort_values(by="ticket_id", ascending=False, ignore_index=True)
+
+
+async def embed_batch(batch: List[Tuple[str, str]], tokens: Optional[int] = None) -> Dict[str, List[float]]:
+    """
+    Embeds a batch of (ticket_id, text) pairs with a single OpenAI request and maps the
+    results back to ticket ids by index. Throttling and transient errors are retried by the
+    upstream client. A batch rejected for its input (HTTP 400) is split in half and only the
+    failing halves are retried, down to single inputs; any other error fails the whole batch,
+    leaving its tickets without vectors.
+    """
     try:
-        response = openai_client.embeddings.create(
-            input=text_to_embed,
-            model=config.OPENAI_EMBEDDING_MODEL
+        embeddings = await openai_client.create_embeddings(
+            config.OPENAI_EMBEDDING_DEPLOYMENT,
+            [text for _, text in batch],
+            tokens=tokens
         )
-        embedding_vector = response.data[0].embedding
-        ticket["vector"] = embedding_vector
-        logger.info(f"Ticket {ticket['id']} vectorized successfully.")
     except Exception as e:
-        logger.info(f"Error vectorizing ticket {ticket['id']}: {e}")
-    return ticket
+        if len(batch) == 1 or not is_input_error(e):
+            # Splitting would only repeat an auth error or an outage for every sub-batch.
+            logger.error(f"Error vectorizing {len(batch)} tickets: {e}")
+            return {}
+        logger.warning(f"Embedding batch of {len(batch)} tickets failed ({e}), retrying as two sub-batches")
+        middle = len(batch) // 2
+        return {**await embed_batch(batch[:middle]), **await embed_batch(batch[middle:])}
+
+    vectors = {ticket_id: vector for (ticket_id, _), vector in zip(batch, embeddings) if vector is not None}
 
+    # Retry any inputs the response did not cover.
+    missing = [pair for pair in batch if pair[0] not in vectors]
+    if missing and len(missing) < len(batch):
+        vectors.update(await embed_batch(missing))
+    elif missing:
+        logger.error(f"Embedding response for {len(batch)} tickets returned no vectors")
+    return vectors
 
-async def upload_ticket(ticket: pd.Series):
+
+async def vectorize_texts(items: List[Tuple[str, str]]) -> Dict[str, List[float]]:
     """
-    Uploads the ticket document to Azure Search.
+    Embeds (key, text) pairs, serving what it can from the embedding cache and sending the
+    rest in batched OpenAI requests. Returns the vectors keyed by the given keys.
     """
-    try:
-        doc_id = str(ticket["id"])
-        # Prepare metadata excluding the vector field.
-        metadata = ticket.drop("vector").to_dict() if "vector" in ticket else ticket.to_dict()
-        upload_success = await azure_client.upload_document(
-            doc_id=doc_id,
-            embedding=ticket["vector"],
-            metadata=metadata
+    vectors = {}
+    # The cache is SQLite backed, keep its disk I/O off the event loop.
+    cached = await asyncio.to_thread(embedding_cache.get_many, config.OPENAI_EMBEDDING_MODEL, [text for _, text in items])
+    for index, vector in cached.items():
+        vectors[items[index][0]] = vector
+    if cached:
+        logger.info(f"{len(cached)} texts served from the embedding cache.")
+    items_to_embed = [item for index, item in enumerate(items) if index not in cached]
+
+    # Batches are packed by the client's token counter; tokenizing is CPU bound, keep it off the event loop.
+    batches = await asyncio.to_thread(pack_embedding_batches, items_to_embed, text=lambda item: item[1])
+    for batch, tokens in batches:
+        logger.info(f"Vectorizing batch of {len(batch)} texts")
+        batch_vectors = await embed_batch(batch, tokens)
+        await asyncio.to_thread(
+            embedding_cache.put_many,
+            config.OPENAI_EMBEDDING_MODEL,
+            [(text, batch_vectors[key]) for key, text in batch if key in batch_vectors]
         )
-        if upload_success:
-            logger.info(f"Uploaded ticket {doc_id} successfully")
-        else:
-            logger.error(f"Upload failed for ticket {doc_id}: Upload result was not successful")
-    except Exception as e:
-        logger.info(f"Error uploading ticket {ticket.get('id', 'unknown')}: {e}")
+        vectors.update(batch_vectors)
+    return vectors
+
+
+async def vectorize_tickets(tickets_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorizes the tickets' title field and stores the results in 'vector'.
+    Tickets without a title are left without a vector.
+    """
+    items = [
+        (ticket_id, title)
+        for ticket_id, title in zip(tickets_df["ticket_id"], tickets_df["title"])
+        if isinstance(title, str) and title.strip()
+    ]
+    skipped = len(tickets_df) - len(items)
+    if skipped:
+        logger.info(f"{skipped} tickets have no title. Skipping vectorization for them.")
+
+    vectors = await vectorize_texts(items)
+    logger.info(f"Vectorized {len(vectors)} of {len(items)} tickets successfully.")
+
+    tickets_df = tickets_df.copy()
+    tickets_df["doc_type"] = "ticket"
+    tickets_df["vector"] = [vectors.get(ticket_id) for ticket_id in tickets_df["ticket_id"]]
+    return tickets_df
+
+
+def build_chunks(tickets_df: pd.DataFrame,
+                 max_tokens: int = config.CHUNK_MAX_TOKENS,
+                 overlap: int = config.CHUNK_OVERLAP_TOKENS) -> pd.DataFrame:
+    """
+    Splits each ticket's discussion into overlapping token windows. Every chunk becomes a child
+    document linked to its parent ticket through 'parent_id'. Chunks only carry the parent fields
+    searches filter on (CHUNK_PARENT_FIELDS), so a keyword match on e.g. the title returns the
+    ticket once rather than the ticket and every one of its chunks.
+    """
+    chunks = []
+    for ticket in tickets_df.to_dict(orient="records"):
+        discussion = ticket.get("discussion")
+        if not isinstance(discussion, str):
+            continue
+        for index, text in enumerate(chunk_text(discussion, max_tokens, overlap)):
+            chunks.append({
+                "id": f"{ticket['id']}_chunk_{index}",
+                **{field: ticket.get(field) for field in CHUNK_PARENT_FIELDS},
+                "parent_id": ticket["id"],
+                "doc_type": "chunk",
+                "chunk_index": index,
+                "discussion": text,
+                "vector": None
+            })
+    columns = ["id", *CHUNK_PARENT_FIELDS, "parent_id", "doc_type", "chunk_index", "discussion", "vector"]
+    return pd.DataFrame(chunks, columns=columns)
+
+
+async def vectorize_chunks(chunks_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorizes the discussion chunks and stores the results in 'vector'.
+    """
+    if chunks_df.empty:
+        return chunks_df
+    vectors = await vectorize_texts(list(zip(chunks_df["id"], chunks_df["discussion"])))
+    logger.info(f"Vectorized {len(vectors)} of {len(chunks_df)} discussion chunks successfully.")
+    chunks_df = chunks_df.copy()
+    chunks_df["vector"] = [vectors.get(chunk_id) for chunk_id in chunks_df["id"]]
+    return chunks_df
+
+
+async def upload_tickets(tickets_df: pd.DataFrame) -> Dict[str, str]:
+    """
+    Uploads ticket (or chunk) documents to Azure Search in bulk.
+    Returns the ids of documents that failed to upload, mapped to the error message.
+    """
+    if tickets_df.empty:
+        return {}
+    documents = []
+    # Missing values would otherwise be serialized as NaN, which is not valid JSON.
+    records = tickets_df.astype(object).where(tickets_df.notna(), None).to_dict(orient="records")
+    for ticket in records:
+        # Prepare metadata excluding the vector field and manifest bookkeeping.
+        metadata = {k: v for k, v in ticket.items() if k not in ("vector", "content_hash")}
+        documents.append(azure_client.build_document(doc_id=str(ticket["id"]), embedding=ticket["vector"], metadata=metadata))
+
+    errors = await azure_client.upload_documents(documents)
+    for doc_id, error in errors.items():
+        logger.error(f"Upload failed for document {doc_id}: {error}")
+    logger.info(f"Uploaded {len(documents) - len(errors)} of {len(documents)} documents successfully")
+    return errors
+
+
+class StageStats:
+    """
+    Throughput counters for a single pipeline stage.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+
+    def record(self, processed: int, failed: int, seconds: float):
+        self.processed += processed
+        self.failed += failed
+        self.busy_seconds += seconds
+
+    @property
+    def throughput(self) -> float:
+        """Tickets per second of wall-clock time since the pipeline started."""
+        elapsed = time.monotonic() - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.name}: {self.processed} tickets ({self.failed} failed), "
+                f"{self.throughput:.1f} tickets/s, busy {self.busy_seconds:.1f}s")
+
+
+class IngestionPipeline:
+    """
+    Streaming read -> embed -> upload pipeline. Each stage runs its own pool of workers and
+    stages are connected by bounded asyncio queues, so a slow stage applies backpressure
+    upstream instead of letting batches pile up in memory.
+    """
+
+    def __init__(self,
+                 batch_size: int = config.INGEST_BATCH_SIZE,
+                 embed_concurrency: int = config.INGEST_EMBED_CONCURRENCY,
+                 upload_concurrency: int = config.INGEST_UPLOAD_CONCURRENCY,
+                 queue_size: int = config.INGEST_QUEUE_SIZE,
+                 report_interval: float = 10.0,
+                 manifest: Optional[IngestManifest] = None):
+        self.batch_size = batch_size
+        self.embed_concurrency = embed_concurrency
+        self.upload_concurrency = upload_concurrency
+        self.queue_size = queue_size
+        self.report_interval = report_interval
+        self.manifest = manifest
+        self.skipped = 0
+        self.stats = {name: StageStats(name) for name in ("read", "embed", "upload")}
+
+    async def _read(self, frames: Iterable[pd.DataFrame], embed_queue: asyncio.Queue):
+        frames = iter(frames)
+        # Frames may be produced lazily (e.g. parsed from a spill on disk), keep that off the event loop.
+        while (frame := await asyncio.to_thread(next, frames, None)) is not None:
+            for start in range(0, len(frame), self.batch_size):
+                started = time.monotonic()
+                batch = frame.iloc[start:start + self.batch_size]
+                if self.manifest is not None:
+                    pending = self.manifest.pending(batch)
+                    self.skipped += len(batch) - len(pending)
+                    batch = pending
+                self.stats["read"].record(len(batch), 0, time.monotonic() - started)
+                if not batch.empty:
+                    await embed_queue.put(batch)
+        for _ in range(self.embed_concurrency):
+            await embed_queue.put(None)
+
+    @staticmethod
+    async def _vectorize(batch: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        # Tokenizing discussions into chunks is CPU bound, keep it off the event loop.
+        chunks = await asyncio.to_thread(build_chunks, batch)
+        return await vectorize_tickets(batch), await vectorize_chunks(chunks)
+
+    async def _embed(self, embed_queue: asyncio.Queue, upload_queue: asyncio.Queue):
+        while (batch := await embed_queue.get()) is not None:
+            started = time.monotonic()
+            batch, chunks = await self._vectorize(batch)
+            failed = int(batch["vector"].isna().sum())
+            self.stats["embed"].record(len(batch), failed, time.monotonic() - started)
+            await upload_queue.put((batch, chunks))
+
+    async def _delete_stale_chunks(self, batch: pd.DataFrame, chunk_counts: Dict[str, int]):
+        """Deletes chunk documents left over from a longer previous version of a ticket."""
+        previous_counts = self.manifest.chunk_counts(batch["ticket_id"])
+        stale = [
+            {azure_client.key_field: f"{doc_id}_chunk_{index}"}
+            for ticket_id, doc_id in zip(batch["ticket_id"], batch["id"])
+            for index in range(chunk_counts.get(str(ticket_id), 0), previous_counts.get(str(ticket_id), 0))
+        ]
+        if stale:
+            await azure_client.upload_documents(stale, action="delete")
+
+    @staticmethod
+    def _missing_vectors(documents: pd.DataFrame, text_column: str) -> pd.Series:
+        """Documents that have text to embed but whose embedding failed."""
+        has_text = documents[text_column].map(lambda text: isinstance(text, str) and bool(text.strip()))
+        return has_text & documents["vector"].isna()
+
+    async def _upload(self, upload_queue: asyncio.Queue):
+        while (item := await upload_queue.get()) is not None:
+            batch, chunks = item
+            started = time.monotonic()
+            # Never index a document without its vector; leave it failed so the next run retries it.
+            missing = self._missing_vectors(batch, "title")
+            errors = {doc_id: "embedding failed" for doc_id in batch.loc[missing, "id"]}
+            errors.update(await upload_tickets(batch[~missing]))
+            if not chunks.empty:
+                missing_chunks = self._missing_vectors(chunks, "discussion")
+                chunk_errors = {chunk_id: "embedding failed" for chunk_id in chunks.loc[missing_chunks, "id"]}
+                chunk_errors.update(await upload_tickets(chunks[~missing_chunks]))
+                # A ticket only counts as uploaded once all of its chunks are.
+                failed_parents = chunks.loc[chunks["id"].isin(list(chunk_errors)), "parent_id"]
+                errors.update({parent_id: "chunk upload failed" for parent_id in failed_parents})
+            if self.manifest is not None:
+                chunk_counts = {str(ticket_id): count for ticket_id, count in chunks.groupby("ticket_id").size().items()}
+                await self._delete_stale_chunks(batch, chunk_counts)
+                self.manifest.record(batch, failed_ids=errors.keys(), chunk_counts=chunk_counts)
+            self.stats["upload"].record(len(batch), len(errors), time.monotonic() - started)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.log_stats()
+
+    def log_stats(self):
+        if self.manifest is not None:
+            logger.info(f"unchanged: {self.skipped} tickets skipped")
+        for stage in self.stats.values():
+            logger.info(str(stage))
+
+    async def _close_upload_queue(self, embedders: List[asyncio.Task], upload_queue: asyncio.Queue):
+        """Tells the uploaders to stop once every embedder has finished."""
+        await asyncio.wait(embedders)
+        for _ in range(self.upload_concurrency):
+            await upload_queue.put(None)
+
+    async def run(self, frames: Iterable[pd.DataFrame]) -> Dict[str, StageStats]:
+        """
+        Runs the pipeline over an iterable of processed ticket DataFrames and returns the stage statistics.
+        If any stage fails, the other stages are cancelled and the error is raised.
+        """
+        embed_queue = asyncio.Queue(maxsize=self.queue_size)
+        upload_queue = asyncio.Queue(maxsize=self.queue_size)
+        for stage in self.stats.values():
+            stage.started_at = time.monotonic()
+
+        reporter = asyncio.create_task(self._report())
+        embedders = [asyncio.create_task(self._embed(embed_queue, upload_queue)) for _ in range(self.embed_concurrency)]
+        stages = [
+            asyncio.create_task(self._read(frames, embed_queue)),
+            *embedders,
+            asyncio.create_task(self._close_upload_queue(embedders, upload_queue)),
+            *[asyncio.create_task(self._upload(upload_queue)) for _ in range(self.upload_concurrency)]
+        ]
+        try:
+            # A failed stage would otherwise leave the stages around it blocked on their queues forever.
+            done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in [reporter, *stages]:
+                task.cancel()
+            await asyncio.gather(reporter, *stages, return_exceptions=True)
+
+        self.log_stats()
+        return self.stats
+
+
+async def ingest(frames: Iterable[pd.DataFrame], manifest: IngestManifest) -> Dict[str, StageStats]:
+    """Runs the pipeline and closes the pooled HTTP client before the event loop goes away."""
+    try:
+        return await IngestionPipeline(manifest=manifest).run(frames)
+    finally:
+        await close_http_client()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Vectorize historical support tickets into Azure AI Search.")
+    parser.add_argument("--input-dir", default="data/OneDrive_1_19-03-2025/",
+                        help="Directory containing the ticket CSV exports")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of processes used to parse CSV files in parallel")
+    parser.add_argument("--chunk-size", type=int, default=config.INGEST_CSV_CHUNK_SIZE,
+                        help="Rows per chunk when streaming CSV files, 0 loads each file at once")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    # Use glob to list all CSV files in the target directory
-    directory = "data/OneDrive_1_19-03-2025/"
-    csv_files = glob.glob(os.path.join(directory, "*.csv"))
+    args = parse_args()
+
+    # Use glob to list all CSV files in the target directory, sorted for a deterministic merge order
+    csv_files = sorted(glob.glob(os.path.join(args.input_dir, "*.csv")))
     logger.info(f"Found CSV files: {csv_files}")
 
-    dfs = []
-    for file in csv_files:
-        logger.info(f"Processing file: {file}")
-        df = process_ticket_csv(file)
-        dfs.append(df)
-
-    if dfs:
-        # Combine all processed dataframes
-        tickets_df = pd.concat(dfs, ignore_index=True)
-        # Group tickets by 'ticket_id' across files to combine duplicate records
-        tickets_df = tickets_df.groupby("ticket_id", as_index=False).agg({
-            "title": "first",
-            "company_name": "first",
-            "date_entered": "first",
-            "discussion": lambda x: " ".join(x.dropna().astype(str)),
-            "type": "first",
-            "priority": "first",
-            "source": "first",
-            "team": "first",
-            "vector": "first"
-        })
-        tickets_df.insert(0, "id", [str(i) for i in range(1, len(tickets_df) + 1)])
-    else:
+    if not csv_files:
         logger.info("No CSV files found in directory. Exiting.")
         sys.exit(1)
 
-    logger.info("Processed ticket data:")
-    logger.info(tickets_df.head())
+    # Tickets are parsed and handed to the pipeline one spill partition at a time.
+    tickets = iter_tickets(csv_files, workers=args.workers, chunksize=args.chunk_size)
 
-    async def main():
-        for idx, ticket in tickets_df.iterrows():
-            logger.info(f"Processing row {idx} with primary id: {ticket['id']} and actual ticket id: {ticket['ticket_id']}")
-            logger.info(ticket)
-            logger.info(f"Discussion length: {len(ticket['discussion']) if isinstance(ticket['discussion'], str) else 'N/A'}")
-            logger.info(f"Starting vectorization for ticket {ticket['id']}")
-            ticket = vectorize_ticket(ticket)
-            logger.info(f"Starting upload for ticket {ticket['id']}")
-            await upload_ticket(ticket)
-
-    asyncio.run(main())
+    manifest = IngestManifest()
+    try:
+        asyncio.run(ingest(tickets, manifest))
+    finally:
+        tickets.close()
+        manifest.close()